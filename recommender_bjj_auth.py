@@ -0,0 +1,104 @@
+# Password hashing is deliberately slow, so logins and registrations run on a bounded
+# thread pool (hashlib's scrypt/pbkdf2 release the GIL, so they use every core) and report
+# back through futures or callbacks. A successful login returns a session token that
+# later operations check in memory instead of verifying the password again.
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# werkzeug method strings; the parameters are recorded in every hash's prefix
+# ("scrypt:32768:8:1$salt$hash"), which is how outdated hashes are spotted on login
+DEFAULT_PASSWORD_METHOD = 'scrypt:32768:8:1'
+SESSION_TTL = 12 * 3600
+
+
+@lru_cache(maxsize=None)
+def password_method(method):
+    # Spells out werkzeug's defaults ('pbkdf2' -> 'pbkdf2:sha256:1000000') so the result
+    # compares equal to the prefix of hashes made with it
+    from werkzeug.security import generate_password_hash
+
+    return generate_password_hash('', method, salt_length=1).split('$', 1)[0]
+
+
+class AuthService:
+    def __init__(self, db, method=DEFAULT_PASSWORD_METHOD, workers=None, session_ttl=SESSION_TTL):
+        self.db = db
+        self.method = method
+        self.session_ttl = session_ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix='bjj-auth')
+        self._lock = threading.Lock()
+        # token -> (user_id, expires_at)
+        self.sessions = {}
+        # Submitted logins/registrations not finished yet, cancelled on close
+        self._pending = set()
+
+    def login(self, username, password, callback=None):
+        # Future resolving to (user_id, token), or None for a bad username/password
+        return self._submit(self._login, callback, username, password)
+
+    def register(self, username, password, skill, level, callback=None):
+        # Future resolving to True, or False if the username is taken
+        return self._submit(self._register, callback, username, password, skill, level)
+
+    def _submit(self, fn, callback, *args):
+        future = self.executor.submit(fn, *args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        if callback is not None:
+            # Runs on the worker thread; GUIs should hand it to their event loop
+            future.add_done_callback(callback)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _login(self, username, password):
+        user_id = self.db.verify_user(username, password, method=password_method(self.method))
+        if user_id is None:
+            return None
+        return user_id, self.create_session(user_id)
+
+    def _register(self, username, password, skill, level):
+        try:
+            self.db.add_user(username, password, skill, level, method=password_method(self.method))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def create_session(self, user_id):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self.sessions[token] = (user_id, time.monotonic() + self.session_ttl)
+        return token
+
+    def session_user(self, token):
+        # user_id for a live session token, else None
+        with self._lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            if session[1] < time.monotonic():
+                del self.sessions[token]
+                return None
+            return session[0]
+
+    def logout(self, token):
+        with self._lock:
+            self.sessions.pop(token, None)
+
+    def close(self):
+        # Queued work is cancelled by hand (shutdown's cancel_futures needs Python 3.9)
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        with self._lock:
+            self.sessions.clear()
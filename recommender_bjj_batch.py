@@ -0,0 +1,184 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from recommender_bjj_func import (Database, MatrixFactorizationRecommender, RecommendationRefresher, S_C_METHODS,
+                                  DEFAULT_CHECKPOINT_DIR, create_periodized_plan, create_weekly_plan, create_sc_plan)
+from recommender_bjj_model import COMPACT_DTYPES, TRAINERS
+
+CSV_FIELDS = ['user_id', 'username', 'skill', 'level', 'recommendations', 'periodized_plan',
+              'weekly_plan', 'sc_method', 'sc_plan']
+
+# Per-process state set up once by init_worker
+_worker = {}
+
+
+def init_worker(db_name, checkpoint_dir, seed, counter, options):
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    # Plans are seeded explicitly (see build_plans); this keeps anything else drawing from
+    # the global random module reproducible per worker
+    random.seed(seed + index)
+    db = Database(db_name, performance=True)
+    _worker['db'] = db
+    # With --materialized, workers only read the recommendations table and never load a model
+    if not options['materialized']:
+        _worker['recommender'] = MatrixFactorizationRecommender(db, checkpoint_dir=checkpoint_dir,
+                                                                backend=options['backend'],
+                                                                compact=options['compact'])
+    _worker['options'] = dict(options, seed=seed)
+
+
+def build_plans(users):
+    options = _worker['options']
+    user_ids = [user[0] for user in users]
+    if options['materialized']:
+        recommendations = _worker['db'].get_recommendations_many(user_ids, options['k'])
+        candidates = recommendations
+    else:
+        recommender = _worker['recommender']
+        recommendations = recommender.recommend_many(user_ids, options['k'])
+        # Weekly plans pick the best technique per focus area, so they get every unrated
+        # technique with its score, as catalog ids (the plan engine shares the catalog)
+        candidates = recommender.rank_block(*recommender.snapshot(), user_ids, len(recommender.catalog))
+    # Plans only depend on (skill, level, weaknesses[, recommendations]) and the run seed,
+    # so members with the same profile share one memoized plan instead of rebuilding it
+    seed = options['seed']
+    records = []
+    for user_id, username, skill, level in users:
+        skill = skill or ''
+        level = level or 'beginner'
+        recommended = recommendations[user_id]
+        records.append({
+            'user_id': user_id,
+            'username': username,
+            'skill': skill,
+            'level': level,
+            'recommendations': recommended,
+            'periodized_plan': create_periodized_plan(skill, level, options['weaknesses'], seed=seed),
+            'weekly_plan': create_weekly_plan(skill, level, candidates[user_id], options['weaknesses'], seed=seed),
+            'sc_method': options['sc_method'],
+            'sc_plan': create_sc_plan(options['sc_method'], skill, level, seed=seed),
+        })
+    return records
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_pool(chunks, workers, initargs):
+    # Keeps a bounded window of chunks in flight and yields results in submission order,
+    # so neither the user list nor the results pile up in memory
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(build_plans, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def run_inline(chunks, initargs):
+    init_worker(*initargs)
+    for chunk in chunks:
+        yield build_plans(chunk)
+
+
+class RecordWriter:
+    def __init__(self, out, fmt):
+        self.out = out
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.fmt == 'csv':
+            row = dict(record)
+            for field in ('recommendations', 'periodized_plan', 'weekly_plan'):
+                row[field] = '\n'.join(row[field])
+            self.writer.writerow(row)
+        else:
+            self.out.write(json.dumps(record) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate recommendations and training plans for every user.')
+    parser.add_argument('--db', default='bjj_recommender.db')
+    parser.add_argument('--output', '-o', default='-', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--k', type=int, default=5, help='recommendations per user')
+    parser.add_argument('--sc-method', choices=list(S_C_METHODS), default='Linear Periodization')
+    parser.add_argument('--weaknesses', default='', help='comma-separated weaknesses/goals applied to every plan')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='0 runs in-process')
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--checkpoint-dir', default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument('--backend', choices=list(TRAINERS), default='sgd', help='training backend')
+    parser.add_argument('--compact', choices=COMPACT_DTYPES,
+                        help='score from float32 or int8 user factors (less memory per worker)')
+    parser.add_argument('--materialized', action='store_true',
+                        help='refresh the recommendations table (changed users only, everyone after a model '
+                             'change) and read recommendations from it')
+    args = parser.parse_args(argv)
+
+    # Train (or validate the checkpoint) once up front so every worker just maps it
+    db = Database(args.db, performance=True)
+    recommender = MatrixFactorizationRecommender(db, checkpoint_dir=args.checkpoint_dir, backend=args.backend,
+                                                 compact=args.compact)
+    if args.materialized:
+        refreshed = RecommendationRefresher(recommender, depth=args.k).refresh()
+        print(f'Refreshed materialized recommendations for {refreshed} users', file=sys.stderr)
+
+    options = {
+        'k': args.k,
+        'backend': args.backend,
+        'compact': args.compact,
+        'materialized': args.materialized,
+        'sc_method': args.sc_method,
+        'weaknesses': [w.strip() for w in args.weaknesses.split(',') if w.strip()],
+    }
+    initargs = (args.db, args.checkpoint_dir, args.seed, multiprocessing.Value('i', 0), options)
+    chunks = chunked(db.iter_users(), args.chunk_size)
+    results = run_pool(chunks, args.workers, initargs) if args.workers > 0 else run_inline(chunks, initargs)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    writer = RecordWriter(out, args.format)
+    start = last_report = time.perf_counter()
+    count = 0
+    try:
+        for records in results:
+            for record in records:
+                writer.write(record)
+            count += len(records)
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f'{count} users, {count / (now - start):.1f} users/sec', file=sys.stderr)
+                last_report = now
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(f'Done: {count} users in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f} users/sec)',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from recommender_bjj_func import (Database, MatrixFactorizationRecommender, RatingWriteQueue, RecommendationRefresher,
+                                  S_C_METHODS, techniques, plan_engine, create_periodized_plan, create_weekly_plan,
+                                  create_sc_plan)
+from recommender_bjj_model import TRAINERS, CompactFactorModel, load_ratings
+
+LEVELS = ['beginner', 'intermediate', 'advanced']
+SKILLS = ['guard', 'submissions', 'takedowns', 'passing', 'escapes']
+
+
+def synthetic_catalog(n_techniques):
+    # The real catalog first, then generated techniques spread over the same categories
+    catalog = {category: list(names) for category, names in techniques.items()}
+    categories = list(catalog)
+    existing = sum(len(names) for names in catalog.values())
+    for i in range(max(n_techniques - existing, 0)):
+        prefix = 'Gi' if i % 2 == 0 else 'No-Gi'
+        catalog[categories[i % len(categories)]].append(f'{prefix}: Synthetic Technique {i:05d}')
+    return catalog
+
+
+def generate_gym_data(db_path, n_users=1000, n_techniques=200, density=0.05, skew=1.0, seed=0):
+    # Fills a fresh database with users and ratings. Technique popularity follows a power
+    # law (p ~ 1 / rank**skew); ratings come from a low-rank taste model plus noise.
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    rng = np.random.default_rng(seed)
+    catalog = synthetic_catalog(n_techniques)
+    names = [name for category in catalog.values() for name in category]
+    db = Database(db_path, performance=True)
+    with db.transaction():
+        db.conn.executemany('INSERT INTO techniques (name, category) VALUES (?, ?)',
+                            [(name, category) for category, category_names in catalog.items()
+                             for name in category_names])
+        # The password column only needs to be non-empty for benchmarking
+        db.conn.executemany('INSERT INTO users (id, username, password, skill, level) VALUES (?, ?, ?, ?, ?)',
+                            [(user_id, f'member{user_id}', 'x', SKILLS[user_id % len(SKILLS)],
+                              LEVELS[user_id % len(LEVELS)]) for user_id in range(1, n_users + 1)])
+
+    popularity = 1.0 / np.arange(1, len(names) + 1) ** skew
+    popularity /= popularity.sum()
+    user_taste = rng.normal(0, 0.6, (n_users, 4))
+    item_taste = rng.normal(0, 0.6, (len(names), 4))
+
+    def rows():
+        for user in range(n_users):
+            count = min(max(rng.binomial(len(names), density), 1), len(names))
+            items = rng.choice(len(names), size=count, replace=False, p=popularity)
+            scores = 3.2 + item_taste[items] @ user_taste[user] + rng.normal(0, 0.5, count)
+            for item, score in zip(items, np.clip(np.rint(scores), 1, 5).astype(int)):
+                yield user + 1, names[item], int(score)
+
+    inserted, _ = db.add_ratings_bulk(rows(), chunk_size=20000)
+    return db, catalog, inserted
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def time_it(fn, warmup=2, repeat=10, ops=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1000
+    return {
+        'repeat': repeat,
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'min_ms': float(samples.min()),
+        'max_ms': float(samples.max()),
+        'throughput_per_s': float(ops * 1000 / samples.mean()) if samples.mean() else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmarks(db, catalog, args):
+    results = {}
+    rng = random.Random(args.seed)
+    names = [name for category in catalog.values() for name in category]
+    user_ids = list(range(1, args.users + 1))
+
+    def record(name, fn, **kwargs):
+        results[name] = time_it(fn, warmup=kwargs.pop('warmup', args.warmup),
+                                repeat=kwargs.pop('repeat', args.repeat), **kwargs)
+        print(f"{name:<40} p50 {results[name]['p50_ms']:10.3f} ms", file=sys.stderr)
+
+    record('db.add_rating', lambda: db.add_rating(rng.choice(user_ids), rng.choice(names), rng.randint(1, 5)),
+           repeat=args.repeat * 10)
+    bulk = [(rng.choice(user_ids), rng.choice(names), rng.randint(1, 5)) for _ in range(10000)]
+    record('db.add_ratings_bulk[10000]', lambda: db.add_ratings_bulk(bulk), ops=len(bulk))
+    record('db.get_user_ratings', lambda: db.get_user_ratings(rng.choice(user_ids)), repeat=args.repeat * 10)
+    n_ratings = db.count_ratings()
+    record('db.get_all_ratings', db.get_all_ratings, ops=n_ratings)
+    record('load_ratings', lambda: load_ratings(db), ops=n_ratings)
+
+    for backend in args.backends:
+        recommender = MatrixFactorizationRecommender(db, catalog=catalog, backend=backend)
+        record(f'update_model[{backend}]', recommender.update_model, warmup=1, repeat=args.train_repeat,
+               ops=n_ratings)
+
+    # cache_size=0 so every call exercises the scoring path
+    recommender = MatrixFactorizationRecommender(db, catalog=catalog, backend=args.backends[0], cache_size=0)
+    record('recommend_techniques', lambda: recommender.recommend_techniques(rng.choice(user_ids)),
+           repeat=args.repeat * 10)
+    block = user_ids[:1000]
+    record(f'recommend_many[{len(block)}]', lambda: recommender.recommend_many(block), ops=len(block))
+    # The same scoring path from int8 user factors (see CompactFactorModel)
+    compact = MatrixFactorizationRecommender(db, catalog=catalog, backend=args.backends[0], cache_size=0,
+                                             compact='int8')
+    record(f'recommend_many[{len(block)}, int8]', lambda: compact.recommend_many(block), ops=len(block))
+    for dtype in ('float32', 'int8'):
+        record(f'compact[{dtype}]', lambda: CompactFactorModel.from_model(recommender.model, dtype),
+               ops=len(recommender.model.user_ids))
+        results[f'compact[{dtype}]']['model_bytes'] = CompactFactorModel.from_model(recommender.model, dtype).nbytes
+    results[f'recommend_many[{len(block)}]']['model_bytes'] = recommender.model.nbytes
+    record('fold_in', lambda: recommender.fold_in(rng.choice(user_ids), rng.choice(names), rng.randint(1, 5)),
+           repeat=args.repeat * 10)
+    # A burst of ratings through the group-commit queue; the write path only, to compare
+    # with db.add_rating (the fold-in hook would retrain this foreground recommender)
+    ratings = RatingWriteQueue(db)
+    burst = [(rng.choice(user_ids), rng.choice(names), rng.randint(1, 5)) for _ in range(1000)]
+    record(f'rating_queue[{len(burst)}]', lambda: [f.result() for f in [ratings.submit(*row) for row in burst]],
+           ops=len(burst))
+    ratings.close()
+    record('popularity.top', lambda: recommender.popularity.top(5, rng.choice(SKILLS), rng.choice(LEVELS)),
+           repeat=args.repeat * 10)
+    record('similar_techniques', lambda: recommender.similar_techniques(rng.choice(names)), repeat=args.repeat * 10)
+
+    refresher = RecommendationRefresher(recommender)
+    record('refresh[full]', lambda: refresher.refresh(full=True), warmup=0, repeat=args.train_repeat,
+           ops=len(user_ids))
+    # Steady state: a handful of members rated something since the last refresh
+    record('refresh[10 dirty]', lambda: (db.add_ratings_bulk([(rng.choice(user_ids), rng.choice(names),
+                                                                rng.randint(1, 5)) for _ in range(10)]),
+                                         refresher.refresh()))
+    record('db.get_recommendations', lambda: db.get_recommendations(rng.choice(user_ids)), repeat=args.repeat * 10)
+
+    recommended = recommender.recommend_techniques(1)
+    weaknesses = ['guard retention', 'takedown defense']
+    for method in S_C_METHODS:
+        record(f'create_sc_plan[{method}]', lambda: create_sc_plan(method, 'guard', rng.choice(LEVELS)),
+               repeat=args.repeat * 10)
+    record('create_periodized_plan', lambda: create_periodized_plan('guard', rng.choice(LEVELS), weaknesses),
+           repeat=args.repeat * 10)
+    record('create_weekly_plan', lambda: create_weekly_plan('guard', rng.choice(LEVELS), recommended, weaknesses),
+           repeat=args.repeat * 10)
+    # A member's whole scored catalog (catalog ids), as batch generation passes it
+    scored = [(technique_id, rng.random()) for technique_id in range(len(plan_engine.catalog))]
+    record('create_weekly_plan[scored]',
+           lambda: plan_engine.build_weekly_plan('guard', rng.choice(LEVELS), scored, weaknesses, rng=rng),
+           repeat=args.repeat * 10)
+    # Seeded plans come from the engine's memo cache after the first build
+    record('create_sc_plan[seeded]',
+           lambda: create_sc_plan('Linear Periodization', 'guard', rng.choice(LEVELS), seed=args.seed),
+           repeat=args.repeat * 10)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    # Returns the benchmarks whose median got slower than baseline * threshold
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old and stats['p50_ms'] > old['p50_ms'] * threshold:
+            regressions.append((name, old['p50_ms'], stats['p50_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the recommender hot paths on synthetic gym data.')
+    parser.add_argument('--db', help='scratch database path (default: a temporary directory)')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--techniques', type=int, default=200)
+    parser.add_argument('--density', type=float, default=0.05, help='fraction of techniques each user rates')
+    parser.add_argument('--skew', type=float, default=1.0, help='power-law exponent of technique popularity')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--train-repeat', type=int, default=3)
+    parser.add_argument('--backends', default='sgd,als', help='comma-separated: ' + ', '.join(TRAINERS))
+    parser.add_argument('--output', '-o', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='baseline JSON report to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed p50 slowdown vs the baseline')
+    args = parser.parse_args(argv)
+    args.backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+
+    scratch = None
+    db_path = args.db
+    if db_path is None:
+        scratch = tempfile.TemporaryDirectory(prefix='bjj_bench_')
+        db_path = os.path.join(scratch.name, 'bjj_recommender.db')
+
+    start = time.perf_counter()
+    db, catalog, n_ratings = generate_gym_data(db_path, args.users, args.techniques, args.density,
+                                               args.skew, args.seed)
+    generate_s = time.perf_counter() - start
+    try:
+        results = run_benchmarks(db, catalog, args)
+    finally:
+        db.close()
+        if scratch is not None:
+            scratch.cleanup()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'users': args.users,
+            'techniques': args.techniques,
+            'density': args.density,
+            'skew': args.skew,
+            'seed': args.seed,
+            'ratings': n_ratings,
+            'generate_s': generate_s,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, old, new in regressions:
+            print(f'REGRESSION {name}: p50 {old:.3f} ms -> {new:.3f} ms', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
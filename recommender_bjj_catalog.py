@@ -0,0 +1,138 @@
+# The technique catalog, interned once: every technique gets a dense integer id (its
+# position in catalog order), with its category and gi/no-gi attribute kept in parallel
+# lists and per-category id arrays. Free-text names resolve through an exact map, a
+# sorted prefix index and a trigram index for typos.
+import bisect
+import re
+from collections import Counter
+
+from recommender_bjj_lazy import LazyModule
+
+np = LazyModule('numpy')
+
+GI_PREFIXES = {'gi': 'gi', 'no-gi': 'no-gi', 'nogi': 'no-gi'}
+# Scores reported by Catalog.resolve
+EXACT, PREFIX = 1.0, 0.9
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'\W+', ' ', text.lower().replace("'", '')).split())
+
+
+def split_name(name):
+    # "No-Gi: Kimura" -> ('no-gi', 'Kimura'); names without a prefix are (None, name)
+    prefix, sep, rest = name.partition(':')
+    if sep and prefix.strip().lower() in GI_PREFIXES:
+        return GI_PREFIXES[prefix.strip().lower()], rest.strip()
+    return None, name.strip()
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Catalog:
+    def __init__(self, categories, min_fuzzy_score=0.45):
+        # categories: {category: [technique names]}; a name listed twice keeps its first
+        # category
+        self.names = []
+        self.index = {}
+        self.category = []
+        self.gi = []
+        self.min_fuzzy_score = min_fuzzy_score
+        for category, names in categories.items():
+            for name in names:
+                if name not in self.index:
+                    self.index[name] = len(self.names)
+                    self.names.append(name)
+                    self.category.append(category)
+                    self.gi.append(split_name(name)[0])
+        self.categories = list(categories)
+        # category -> dense ids in catalog order
+        self.members = {category: tuple(i for i, c in enumerate(self.category) if c == category)
+                        for category in self.categories}
+        self._arrays = None
+        # Resolver indexes over normalized keys: the full name ("no gi kimura") and the
+        # bare technique ("kimura"), which several names can share
+        self._keys = {}
+        for technique_id, name in enumerate(self.names):
+            for key in {normalize(name), normalize(split_name(name)[1])}:
+                self._keys.setdefault(key, []).append(technique_id)
+        self._sorted_keys = sorted(self._keys)
+        self._grams = {}
+        for key in self._sorted_keys:
+            for gram in trigrams(key):
+                self._grams.setdefault(gram, []).append(key)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def to_dict(self):
+        return {category: [self.names[i] for i in ids] for category, ids in self.members.items()}
+
+    def ids_in(self, category):
+        # Dense ids of a category as an int32 array (built once)
+        if self._arrays is None:
+            self._arrays = {c: np.array(ids, dtype=np.int32) for c, ids in self.members.items()}
+        return self._arrays.get(category, np.empty(0, dtype=np.int32))
+
+    def resolve(self, query, limit=5):
+        # [(id, score)] best first: exact name (1.0), prefix of a name (0.9), then names
+        # sharing enough trigrams with the query (Dice coefficient)
+        if query in self.index:
+            return [(self.index[query], EXACT)]
+        key = normalize(query)
+        if not key:
+            return []
+        if key in self._keys:
+            return [(technique_id, EXACT) for technique_id in self._keys[key][:limit]]
+        matches = {}
+        start = bisect.bisect_left(self._sorted_keys, key)
+        for candidate in self._sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            for technique_id in self._keys[candidate]:
+                matches.setdefault(technique_id, PREFIX)
+        if matches:
+            return sorted(matches.items(), key=lambda match: match[0])[:limit]
+        query_grams = trigrams(key)
+        shared = Counter(candidate for gram in query_grams for candidate in self._grams.get(gram, ()))
+        for candidate, count in shared.items():
+            score = 2 * count / (len(query_grams) + len(trigrams(candidate)))
+            if score >= self.min_fuzzy_score:
+                for technique_id in self._keys[candidate]:
+                    matches[technique_id] = max(matches.get(technique_id, 0), score)
+        return sorted(matches.items(), key=lambda match: (-match[1], match[0]))[:limit]
+
+    def resolve_one(self, query):
+        # The technique name a query unambiguously refers to, else None
+        matches = self.resolve(query, limit=2)
+        if len(matches) == 1 or (len(matches) == 2 and matches[0][1] > matches[1][1]):
+            return self.names[matches[0][0]]
+        return None
+
+
+class CatalogIds:
+    # One database's techniques.id for every catalog position, and back. Databases number
+    # techniques in their own order, so each Database keeps its own (see
+    # Database.catalog_ids) and the shared Catalog stays the same for all of them.
+    def __init__(self, catalog, technique_ids):
+        # technique_ids: {name: techniques.id} covering every catalog name
+        self.catalog = catalog
+        self.db_ids = np.array([technique_ids[name] for name in catalog.names], dtype=np.int64)
+        self._dense = np.full(int(self.db_ids.max()) + 1 if len(self.db_ids) else 0, -1, dtype=np.intp)
+        self._dense[self.db_ids] = np.arange(len(catalog))
+
+    def from_db_ids(self, db_ids):
+        # Dense ids for an array of techniques.id values; ids outside the catalog are dropped
+        db_ids = np.asarray(db_ids, dtype=np.int64)
+        db_ids = db_ids[(db_ids >= 0) & (db_ids < len(self._dense))]
+        dense = self._dense[db_ids]
+        return dense[dense >= 0]
@@ -0,0 +1,235 @@
+# Offline evaluation and hyperparameter search. Ratings are loaded once and written to a
+# scratch directory as .npy files that every worker maps read-only, so tasks only carry
+# (params, fold). Each configuration reports RMSE, precision@k and NDCG@k, fit time,
+# per-user scoring latency and model size, and the Pareto-optimal ones are marked. With
+# --compact each fitted model is also scored from compact (float32/int8) stores, which
+# shows the accuracy each store gives up for its memory.
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from recommender_bjj_func import Database
+from recommender_bjj_model import (COMPACT_DTYPES, DEFAULT_SVD_PARAMS, TRAINERS, CompactFactorModel, RatingsData,
+                                   default_params, load_ratings, top_k)
+
+# Per-process state set up once by init_worker
+_worker = {}
+
+
+def assign_folds(data, folds=5, split='kfold', test_fraction=0.2, seed=0):
+    # Fold number per rating. kfold: a random fold in [0, folds). time: the newest
+    # test_fraction of ratings (by rowid, i.e. write order) are fold 0, the rest -1 so
+    # they are always in the training set.
+    if split == 'time':
+        fold = np.full(len(data), -1, dtype=np.int8)
+        fold[len(data) - int(round(len(data) * test_fraction)):] = 0
+        return fold
+    return np.random.default_rng(seed).permutation(np.arange(len(data)) % folds).astype(np.int8)
+
+
+def share_data(data, fold, directory):
+    for name in ('users', 'items', 'ratings', 'user_ids'):
+        np.save(os.path.join(directory, f'{name}.npy'), getattr(data, name))
+    np.save(os.path.join(directory, 'fold.npy'), fold)
+    with open(os.path.join(directory, 'item_names.json'), 'w') as f:
+        json.dump(data.item_names, f)
+
+
+def init_worker(directory, options):
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+              for name in ('users', 'items', 'ratings', 'user_ids', 'fold')}
+    with open(os.path.join(directory, 'item_names.json')) as f:
+        item_names = json.load(f)
+    _worker['data'] = RatingsData(arrays['users'], arrays['items'], arrays['ratings'], arrays['user_ids'],
+                                  item_names)
+    _worker['fold'] = arrays['fold']
+    _worker['options'] = options
+
+
+def ranking_metrics(model, train, test, k, threshold, block_size=1024):
+    # precision@k and NDCG@k over users with at least one test rating >= threshold, with
+    # every item the user rated in training excluded from the ranking
+    model.align_items(train.item_names)
+    relevant = test.ratings >= threshold
+    test_users = np.unique(test.users[relevant])
+    if not len(test_users):
+        return 0.0, 0.0
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    precision = ndcg = 0.0
+    for start in range(0, len(test_users), block_size):
+        block = test_users[start:start + block_size]
+        row_of = np.full(len(train.user_ids), -1, dtype=np.intp)
+        row_of[block] = np.arange(len(block))
+        scores = model.score_users(train.user_ids[block].tolist())
+        seen = row_of[train.users] >= 0
+        scores[row_of[train.users[seen]], train.items[seen]] = -np.inf
+        hits = np.zeros(scores.shape, dtype=bool)
+        mask = relevant & (row_of[test.users] >= 0)
+        hits[row_of[test.users[mask]], test.items[mask]] = True
+        best = top_k(scores, k)
+        found = np.take_along_axis(hits, best, axis=1)
+        precision += (found.sum(axis=1) / k).sum()
+        ideal = np.cumsum(discounts)[np.minimum(hits.sum(axis=1), k) - 1]
+        ndcg += ((found * discounts[:best.shape[1]]).sum(axis=1) / ideal).sum()
+    return precision / len(test_users), ndcg / len(test_users)
+
+
+def evaluate(task):
+    params, fold_number = task
+    data, fold, options = _worker['data'], _worker['fold'], _worker['options']
+    test_mask = fold == fold_number
+    train, test = data.subset(~test_mask), data.subset(test_mask)
+    start = time.perf_counter()
+    model = TRAINERS[options['backend']](train, random_state=options['seed'], **params)
+    fit_s = time.perf_counter() - start
+    model.align_items(train.item_names)
+    # One result per store, all from the same fit
+    results = []
+    for store in ('float64', *options['compact']):
+        compact = model if store == 'float64' else CompactFactorModel.from_model(model, store)
+        results.append(dict(measure(compact, train, test, options), params=params, store=store,
+                            fold=int(fold_number), fit_s=fit_s))
+    return results
+
+
+def measure(model, train, test, options):
+    predictions = model.predict_many(train.user_ids[test.users].tolist(),
+                                     [train.item_names[item] for item in test.items])
+    rmse = float(np.sqrt(np.mean((predictions - test.ratings) ** 2)))
+    sample = train.user_ids[:min(len(train.user_ids), 1024)].tolist()
+    start = time.perf_counter()
+    model.score_users(sample)
+    score_us = (time.perf_counter() - start) / max(len(sample), 1) * 1e6
+    precision, ndcg = ranking_metrics(model, train, test, options['k'], options['threshold'])
+    return {'rmse': rmse, 'precision': float(precision), 'ndcg': float(ndcg), 'score_us': score_us,
+            'model_bytes': int(model.nbytes)}
+
+
+def parse_grid(spec):
+    # "n_factors=10,20,50;reg_all=0.02,0.05" -> {'n_factors': [10, 20, 50], 'reg_all': [0.02, 0.05]}
+    grid = {}
+    for part in filter(None, (p.strip() for p in spec.split(';'))):
+        name, _, values = part.partition('=')
+        grid[name.strip()] = [json.loads(value) for value in values.split(',')]
+    return grid
+
+
+def configurations(grid, n_random=None, seed=0, backend='sgd'):
+    names = list(grid)
+    combos = [dict(default_params(backend), **dict(zip(names, values)))
+              for values in itertools.product(*(grid[name] for name in names))]
+    if n_random is not None and n_random < len(combos):
+        combos = random.Random(seed).sample(combos, n_random)
+    return combos
+
+
+def summarize(results, objective):
+    # Mean over folds per configuration and store, then mark the configurations no other
+    # one beats on accuracy, fit time, scoring latency and memory at once
+    by_params = {}
+    for result in results:
+        key = json.dumps([result['params'], result['store']], sort_keys=True)
+        by_params.setdefault(key, []).append(result)
+    rows = []
+    for key, runs in by_params.items():
+        params, store = json.loads(key)
+        row = {'params': params, 'store': store, 'folds': len(runs)}
+        for metric in ('rmse', 'precision', 'ndcg', 'fit_s', 'score_us', 'model_bytes'):
+            row[metric] = float(np.mean([run[metric] for run in runs]))
+        rows.append(row)
+    sign = 1 if objective == 'rmse' else -1
+    costs = [(sign * row[objective], row['fit_s'], row['score_us'], row['model_bytes']) for row in rows]
+    for row, cost in zip(rows, costs):
+        row['pareto'] = not any(all(o <= c for o, c in zip(other, cost)) and other != cost for other in costs)
+    rows.sort(key=lambda row: sign * row[objective])
+    return rows
+
+
+def print_table(rows, names, k, out=sys.stdout):
+    header = [*names, 'store', 'rmse', f'prec@{k}', f'ndcg@{k}', 'fit_s', 'score_us', 'model_kb', 'pareto']
+    table = [[str(row['params'][name]) for name in names] +
+             [row['store'], f"{row['rmse']:.4f}", f"{row['precision']:.4f}", f"{row['ndcg']:.4f}",
+              f"{row['fit_s']:.3f}", f"{row['score_us']:.2f}", f"{row['model_bytes'] / 1024:.1f}",
+              '*' if row['pareto'] else '']
+             for row in rows]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *table)]
+    for line in [header] + table:
+        print('  '.join(cell.rjust(width) for cell, width in zip(line, widths)), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate recommender hyperparameters.')
+    parser.add_argument('--db', default='bjj_recommender.db')
+    parser.add_argument('--backend', choices=list(TRAINERS), default='sgd')
+    parser.add_argument('--split', choices=['kfold', 'time'], default='kfold')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='newest ratings held out (--split time)')
+    parser.add_argument('--grid', default='n_factors=10,20,50;reg_all=0.02,0.05',
+                        help='semicolon-separated name=v1,v2 lists; unset parameters use the defaults')
+    parser.add_argument('--random', type=int, help='evaluate this many random configurations from the grid')
+    parser.add_argument('--k', type=int, default=5, help='cutoff for precision@k and NDCG@k')
+    parser.add_argument('--threshold', type=float, default=4, help='test ratings >= this count as relevant')
+    parser.add_argument('--objective', choices=['rmse', 'precision', 'ndcg'], default='rmse')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='0 runs in-process')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compact', default='', help='comma-separated compact stores to score each fit from too: '
+                                                      + ', '.join(COMPACT_DTYPES))
+    parser.add_argument('--output', '-o', help='also write the results here (.json or .csv)')
+    args = parser.parse_args(argv)
+    compact = [store.strip() for store in args.compact.split(',') if store.strip()]
+    for store in compact:
+        if store not in COMPACT_DTYPES:
+            parser.error(f'unknown compact store: {store}')
+
+    db = Database(args.db, performance=True)
+    data = load_ratings(db, ordered=args.split == 'time')
+    db.close()
+    if not len(data):
+        print('No ratings to evaluate', file=sys.stderr)
+        return 1
+    fold = assign_folds(data, args.folds, args.split, args.test_fraction, args.seed)
+    folds = [0] if args.split == 'time' else list(range(args.folds))
+    grid = parse_grid(args.grid)
+    tasks = [(params, fold_number) for params in configurations(grid, args.random, args.seed, args.backend)
+             for fold_number in folds]
+    options = {'backend': args.backend, 'seed': args.seed, 'k': args.k, 'threshold': args.threshold,
+               'compact': compact}
+    print(f'{len(data)} ratings, {len(tasks)} fits', file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(prefix='bjj_eval_') as directory:
+        share_data(data, fold, directory)
+        del data
+        if args.workers > 0:
+            with multiprocessing.Pool(args.workers, initializer=init_worker,
+                                      initargs=(directory, options)) as pool:
+                results = [result for runs in pool.imap_unordered(evaluate, tasks) for result in runs]
+        else:
+            init_worker(directory, options)
+            results = [result for task in tasks for result in evaluate(task)]
+
+    rows = summarize(results, args.objective)
+    print_table(rows, list(grid), args.k)
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            if args.output.endswith('.csv'):
+                writer = csv.DictWriter(f, fieldnames=list(DEFAULT_SVD_PARAMS) +
+                                        ['store', 'folds', 'rmse', 'precision', 'ndcg', 'fit_s', 'score_us',
+                                         'model_bytes', 'pareto'], extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(dict(row, **row['params']) for row in rows)
+            else:
+                json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
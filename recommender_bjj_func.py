@@ -1,14 +1,28 @@
-import numpy as np
-from sklearn.neighbors import NearestNeighbors
-from surprise import SVD, Dataset, Reader
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QMessageBox
-from PyQt5.QtCore import Qt
-import sys
-from surprise import SVD, Dataset, Reader
-import pandas as pd
+# GUI-free core: Database, recommender and plan generators. Heavy dependencies are
+# loaded on first use so batch workers and services start fast; the PyQt5 GUI lives in
+# recommender_bjj_gui.py.
+import json
 import random
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
+import logging
+import queue
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from recommender_bjj_catalog import Catalog, CatalogIds
+from recommender_bjj_lazy import LazyModule
+from recommender_bjj_metrics import metrics, timed
+from recommender_bjj_model import (FOLD_IN_PARAMS, RATING_SCALE, TRAINERS, default_params, training_config,
+                                   CompactFactorModel, ItemNeighborIndex, top_k, load_ratings, save_checkpoint,
+                                   load_checkpoint)
+from recommender_bjj_plans import (PlanEngine, dynamic_effort_body, conjugate_body, linear_body, undulating_body,
+                                   block_body)
+
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
 
 # Define BJJ techniques with categories
 techniques = {
@@ -18,6 +32,8 @@ techniques = {
     "Takedowns": ["Gi: Double Leg", "Gi: Single Leg", "No-Gi: Ankle Pick", "No-Gi: Blast Double"],
     "Guard": ["Gi: Closed Guard", "Gi: Spider Guard", "No-Gi: Butterfly Guard", "No-Gi: X-Guard"]
 }
+# The same catalog interned to dense ids (see recommender_bjj_catalog)
+technique_catalog = Catalog(techniques)
 
 # Simple user database (user_id, skill, level, preferred_techniques)
 users = [
@@ -26,6 +42,9 @@ users = [
     (3, "takedowns", "advanced", ["Gi: Double Leg", "No-Gi: Ankle Pick"])
 ]
 
+# Where the GUI keeps trained model checkpoints
+DEFAULT_CHECKPOINT_DIR = 'bjj_model_checkpoints'
+
 S_C_METHODS = {
     "Dynamic Effort Method": "Focuses on moving submaximal weights with maximum speed to develop explosive strength.",
     "Conjugate Method (Westside Barbell)": "Rotates between maximal effort and dynamic effort days, focusing on variety in exercise selection.",
@@ -33,13 +52,99 @@ S_C_METHODS = {
     "Undulating Periodization": "Varies volume and intensity more frequently, often within the same week.",
     "Block Periodization": "Focuses on specific adaptations (e.g., hypertrophy, strength, power) in distinct blocks."
 }
+class ConnectionPool:
+    # Hands each thread its own read-only connection, so readers (GUI, trainer, batch
+    # jobs) run concurrently under WAL instead of queueing on the writer connection
+    def __init__(self, db_name, pragmas=()):
+        self.db_name = db_name
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
+            for pragma in self.pragmas:
+                conn.execute(f'PRAGMA {pragma}')
+            conn.execute('PRAGMA query_only = ON')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+# Opt-in SQLite tuning (Database(performance=True)). synchronous=NORMAL is safe against
+# corruption in WAL mode; only the last transactions can be lost on power failure.
+PERFORMANCE_PRAGMAS = ('synchronous = NORMAL', 'cache_size = -65536', 'mmap_size = 268435456',
+                       'temp_store = MEMORY', 'busy_timeout = 30000')
+# Covering indexes for get_user_ratings / get_rated_technique_ids (by user) and
+# per-technique lookups (by technique)
+PERFORMANCE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_ratings_user ON ratings (user_id, technique_id, rating)',
+    'CREATE INDEX IF NOT EXISTS idx_ratings_technique ON ratings (technique_id, user_id, rating)',
+)
+
+# technique_stats keeps a rating count and sum per technique for every slice: all ratings,
+# and the ratings of each level and skill (as recorded when the rating was written)
+GLOBAL_SLICE = 'all'
+
+
+def stat_slices(skill, level):
+    slices = [GLOBAL_SLICE]
+    if level:
+        slices.append(f'level:{level}')
+    if skill:
+        slices.append(f'skill:{skill}')
+    return slices
+
+
 class Database:
-    def __init__(self, db_name='bjj_recommender.db'):
-        self.conn = sqlite3.connect(db_name)
+    def __init__(self, db_name='bjj_recommender.db', performance=False):
+        self.db_name = db_name
+        self.performance = performance
+        # One writer connection shared by all threads; writes serialize on _write_lock
+        self.conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False)
+        self._write_lock = threading.RLock()
+        self.pool = None
+        # callback(rows) with rows = [(user_id, technique_name, rating), ...] after each commit
+        self.rating_listeners = []
+        # name -> id, loaded on first use (see get_technique_ids)
+        self._technique_ids = None
+        # Catalog -> CatalogIds for this database, set by sync_catalog
+        self._catalog_ids = {}
         self.create_tables()
+        if performance:
+            self.apply_performance_profile()
+
+    def apply_performance_profile(self):
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        for pragma in PERFORMANCE_PRAGMAS:
+            self.conn.execute(f'PRAGMA {pragma}')
+        with self.transaction():
+            for statement in PERFORMANCE_INDEXES:
+                self.conn.execute(statement)
+        # Separate connections to ':memory:' would each see their own empty database
+        if self.db_name != ':memory:':
+            self.pool = ConnectionPool(self.db_name, PERFORMANCE_PRAGMAS)
+
+    @contextmanager
+    def transaction(self):
+        with self._write_lock, self.conn:
+            yield self.conn
+
+    def reader(self):
+        return self.pool.reader() if self.pool is not None else self.conn
 
     def create_tables(self):
-        with self.conn:
+        with self.transaction():
             self.conn.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY,
@@ -66,44 +171,294 @@ class Database:
                     PRIMARY KEY (user_id, technique_id)
                 )
             ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS technique_stats (
+                    slice TEXT NOT NULL,
+                    technique_id INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    PRIMARY KEY (slice, technique_id)
+                ) WITHOUT ROWID
+            ''')
+            # Materialized top-k per user (see RecommendationRefresher). Rating writes
+            # mark users in dirty_users; recommendation_state records which model and
+            # depth the table was last fully built with.
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS recommendations (
+                    user_id INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    technique_id INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    model_version INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, rank)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS dirty_users (
+                    user_id INTEGER PRIMARY KEY,
+                    seq INTEGER NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_dirty_users_seq ON dirty_users (seq)')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS recommendation_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    model_version INTEGER NOT NULL,
+                    model_key TEXT NOT NULL,
+                    depth INTEGER NOT NULL
+                )
+            ''')
+            # Databases from before the counters existed are backfilled once
+            if (self.conn.execute('SELECT NOT EXISTS (SELECT 1 FROM technique_stats)').fetchone()[0] and
+                    self.conn.execute('SELECT EXISTS (SELECT 1 FROM ratings)').fetchone()[0]):
+                self.rebuild_technique_stats()
+
+    @timed('Database.add_user')
+    def add_user(self, username, password, skill, level, method=None):
+        # method: werkzeug hash method string (see recommender_bjj_auth); None uses
+        # werkzeug's default
+        from werkzeug.security import generate_password_hash
 
-    def add_user(self, username, password, skill, level):
-        hashed_password = generate_password_hash(password)
-        with self.conn:
+        hashed_password = generate_password_hash(password, method) if method else generate_password_hash(password)
+        with self.transaction():
             self.conn.execute('INSERT INTO users (username, password, skill, level) VALUES (?, ?, ?, ?)',
                               (username, hashed_password, skill, level))
 
-    def verify_user(self, username, password):
-        cursor = self.conn.execute('SELECT id, password FROM users WHERE username = ?', (username,))
+    @timed('Database.verify_user')
+    def verify_user(self, username, password, method=None):
+        # With method, a hash made with other KDF parameters is replaced by a fresh one
+        # while the plaintext is at hand
+        from werkzeug.security import check_password_hash, generate_password_hash
+
+        cursor = self.reader().execute('SELECT id, password FROM users WHERE username = ?', (username,))
         user = cursor.fetchone()
-        if user and check_password_hash(user[1], password):
-            return user[0]
-        return None
+        if not (user and check_password_hash(user[1], password)):
+            return None
+        if method and user[1].split('$', 1)[0] != method:
+            # Hashed before taking the writer lock; the KDF is deliberately slow
+            new_hash = generate_password_hash(password, method)
+            with self.transaction():
+                self.conn.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                                  (new_hash, user[0], user[1]))
+        return user[0]
+
+    def iter_users(self, batch_size=1000):
+        # Streams (id, username, skill, level) without materialising the whole table
+        cursor = self.reader().execute('SELECT id, username, skill, level FROM users ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
 
     def get_user_info(self, user_id):
-        cursor = self.conn.execute('SELECT skill, level FROM users WHERE id = ?', (user_id,))
+        cursor = self.reader().execute('SELECT skill, level FROM users WHERE id = ?', (user_id,))
         return cursor.fetchone()
 
+    def get_user_profiles(self, user_ids, conn=None):
+        # {user_id: (skill, level)} for a block of users; unknown ids are left out
+        conn = conn or self.reader()
+        profiles = {}
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            cursor = conn.execute(f"SELECT id, skill, level FROM users WHERE id IN ({', '.join('?' * len(chunk))})",
+                                  chunk)
+            for user_id, skill, level in cursor:
+                profiles[user_id] = (skill, level)
+        return profiles
+
     def add_technique(self, name, category):
-        with self.conn:
+        with self.transaction():
             self.conn.execute('INSERT OR IGNORE INTO techniques (name, category) VALUES (?, ?)', (name, category))
 
     def get_technique_id(self, name):
-        cursor = self.conn.execute('SELECT id FROM techniques WHERE name = ?', (name,))
+        technique_ids = self.get_technique_ids()
+        if name in technique_ids:
+            return technique_ids[name]
+        # Possibly added by another connection since the map was loaded
+        cursor = self.reader().execute('SELECT id FROM techniques WHERE name = ?', (name,))
         result = cursor.fetchone()
+        if result:
+            technique_ids[name] = result[0]
         return result[0] if result else None
 
+    def get_technique_ids(self):
+        if self._technique_ids is None:
+            self._technique_ids = dict(self.reader().execute('SELECT name, id FROM techniques'))
+        return self._technique_ids
+
+    @timed('Database.sync_catalog', rows=int)
+    def sync_catalog(self, catalog):
+        # Seeds the techniques table from the catalog and fixes changed categories. Rows
+        # the catalog no longer lists are kept: ratings still reference them. Writes only
+        # when something differs, so every process can call it on startup. Returns the
+        # number of rows written; the catalog's ids in this database are then available
+        # from catalog_ids.
+        existing = {name: (technique_id, category) for technique_id, name, category
+                    in self.reader().execute('SELECT id, name, category FROM techniques')}
+        missing = [(name, catalog.category[i]) for i, name in enumerate(catalog.names) if name not in existing]
+        moved = [(catalog.category[i], existing[name][0]) for i, name in enumerate(catalog.names)
+                 if name in existing and existing[name][1] != catalog.category[i]]
+        if missing or moved:
+            with self.transaction():
+                self.conn.executemany('INSERT OR IGNORE INTO techniques (name, category) VALUES (?, ?)', missing)
+                self.conn.executemany('UPDATE techniques SET category = ? WHERE id = ?', moved)
+            self._technique_ids = dict(self.conn.execute('SELECT name, id FROM techniques'))
+        self._catalog_ids[catalog] = CatalogIds(catalog, self.get_technique_ids())
+        return len(missing) + len(moved)
+
+    def catalog_ids(self, catalog):
+        # The CatalogIds mapping catalog positions to this database's techniques.id
+        if catalog not in self._catalog_ids:
+            self.sync_catalog(catalog)
+        return self._catalog_ids[catalog]
+
+    @timed('Database.add_rating', rows=int)
     def add_rating(self, user_id, technique_name, rating):
         technique_id = self.get_technique_id(technique_name)
         if technique_id is None:
             return False
-        with self.conn:
+        with self.transaction():
+            old = self.conn.execute('SELECT rating FROM ratings WHERE user_id = ? AND technique_id = ?',
+                                    (user_id, technique_id)).fetchone()
             self.conn.execute('INSERT OR REPLACE INTO ratings (user_id, technique_id, rating) VALUES (?, ?, ?)',
                               (user_id, technique_id, rating))
+            self._update_technique_stats([(user_id, technique_id, old[0] if old else None, rating)])
+            self._mark_users_dirty([user_id])
+        self._notify_rating_listeners([(user_id, technique_name, rating)])
         return True
 
+    @timed('Database.add_ratings_bulk', rows=lambda result: result[0])
+    def add_ratings_bulk(self, rows, chunk_size=5000, on_reject=None):
+        # rows: iterable of (user_id, technique_name, rating). Valid rows are written with
+        # executemany, one transaction per chunk; bad rows are reported, not fatal.
+        # Returns (inserted, rejected) where rejected holds (index, row, reason) tuples,
+        # unless on_reject(index, row, reason) is given to receive them instead.
+        rejected = []
+        if on_reject is None:
+            on_reject = lambda index, row, reason: rejected.append((index, row, reason))
+        inserted = 0
+        batch = []
+        written = []
+        unknown = set()
+        for index, row in enumerate(rows):
+            try:
+                user_id, technique_name, rating = row
+                user_id, rating = int(user_id), int(rating)
+                if not isinstance(technique_name, str):
+                    raise TypeError(technique_name)
+            except (TypeError, ValueError):
+                on_reject(index, row, 'malformed row')
+                continue
+            if not 1 <= rating <= 5:
+                on_reject(index, row, 'rating out of range')
+                continue
+            technique_id = None if technique_name in unknown else self.get_technique_id(technique_name)
+            if technique_id is None:
+                unknown.add(technique_name)
+                on_reject(index, row, 'unknown technique')
+                continue
+            batch.append((user_id, technique_id, rating))
+            written.append((user_id, technique_name, rating))
+            if len(batch) >= chunk_size:
+                inserted += self._write_ratings(batch, written)
+                batch, written = [], []
+        if batch:
+            inserted += self._write_ratings(batch, written)
+        return inserted, rejected
+
+    def _write_ratings(self, batch, written):
+        with self.transaction():
+            # Ratings being replaced, keyed by (user_id, technique_id); later rows in the
+            # batch replace earlier ones
+            current = {}
+            user_ids = list({user_id for user_id, _, _ in batch})
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                cursor = self.conn.execute(f'''
+                    SELECT user_id, technique_id, rating FROM ratings
+                    WHERE user_id IN ({', '.join('?' * len(chunk))})
+                ''', chunk)
+                current.update(((user_id, technique_id), rating) for user_id, technique_id, rating in cursor)
+            changes = []
+            for user_id, technique_id, rating in batch:
+                changes.append((user_id, technique_id, current.get((user_id, technique_id)), rating))
+                current[user_id, technique_id] = rating
+            self.conn.executemany('INSERT OR REPLACE INTO ratings (user_id, technique_id, rating) VALUES (?, ?, ?)',
+                                  batch)
+            self._update_technique_stats(changes)
+            self._mark_users_dirty(user_ids)
+        self._notify_rating_listeners(written)
+        return len(batch)
+
+    def _mark_users_dirty(self, user_ids):
+        # Inside the caller's transaction. Every write gets a higher seq than any mark
+        # still pending, so a refresh that read a user's older mark leaves this one in
+        # place (see clear_dirty_users).
+        seq = self.conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM dirty_users').fetchone()[0]
+        self.conn.executemany('''
+            INSERT INTO dirty_users (user_id, seq) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET seq = excluded.seq
+        ''', [(user_id, seq) for user_id in set(user_ids)])
+
+    def _update_technique_stats(self, changes):
+        # changes: (user_id, technique_id, old rating or None, new rating), applied inside
+        # the caller's transaction as one upsert per touched (slice, technique)
+        profiles = self.get_user_profiles({user_id for user_id, _, _, _ in changes}, conn=self.conn)
+        deltas = {}
+        for user_id, technique_id, old, new in changes:
+            skill, level = profiles.get(user_id, (None, None))
+            for stat_slice in stat_slices(skill, level):
+                delta = deltas.setdefault((stat_slice, technique_id), [0, 0])
+                delta[0] += old is None
+                delta[1] += new - (old or 0)
+        self.conn.executemany('''
+            INSERT INTO technique_stats (slice, technique_id, n, total) VALUES (?, ?, ?, ?)
+            ON CONFLICT (slice, technique_id) DO UPDATE SET n = n + excluded.n, total = total + excluded.total
+        ''', [(stat_slice, technique_id, n, total) for (stat_slice, technique_id), (n, total) in deltas.items()])
+
+    def rebuild_technique_stats(self):
+        # Recounts technique_stats from scratch, e.g. after ratings were written with
+        # plain SQL behind the Database's back
+        with self.transaction():
+            self.conn.execute('DELETE FROM technique_stats')
+            self.conn.execute('''
+                INSERT INTO technique_stats (slice, technique_id, n, total)
+                SELECT ?, technique_id, COUNT(*), SUM(rating) FROM ratings GROUP BY technique_id
+            ''', (GLOBAL_SLICE,))
+            for column in ('level', 'skill'):
+                self.conn.execute(f'''
+                    INSERT INTO technique_stats (slice, technique_id, n, total)
+                    SELECT '{column}:' || u.{column}, r.technique_id, COUNT(*), SUM(r.rating)
+                    FROM ratings r
+                    JOIN users u ON u.id = r.user_id
+                    WHERE u.{column} IS NOT NULL AND u.{column} != ''
+                    GROUP BY u.{column}, r.technique_id
+                ''')
+
+    @timed('Database.get_technique_stats', rows=len)
+    def get_technique_stats(self, stat_slice=GLOBAL_SLICE):
+        # {technique name: (count, sum)}: one primary-key range read of at most one row
+        # per technique, whatever the size of the ratings table
+        cursor = self.reader().execute('''
+            SELECT t.name, s.n, s.total
+            FROM technique_stats s
+            JOIN techniques t ON s.technique_id = t.id
+            WHERE s.slice = ?
+        ''', (stat_slice,))
+        return {name: (n, total) for name, n, total in cursor}
+
+    def add_rating_listener(self, callback):
+        self.rating_listeners.append(callback)
+
+    def _notify_rating_listeners(self, rows):
+        for callback in self.rating_listeners:
+            callback(rows)
+
+    @timed('Database.get_user_ratings', rows=len)
     def get_user_ratings(self, user_id):
-        cursor = self.conn.execute('''
+        cursor = self.reader().execute('''
             SELECT t.name, r.rating
             FROM ratings r
             JOIN techniques t ON r.technique_id = t.id
@@ -111,8 +466,125 @@ class Database:
         ''', (user_id,))
         return cursor.fetchall()
 
+    @timed('Database.get_rated_technique_ids', rows=lambda rated: sum(map(len, rated.values())))
+    def get_rated_technique_ids(self, user_ids):
+        # {user_id: [technique ids]} for a block of users; reads only the ratings index,
+        # no join (see CatalogIds.from_db_ids for turning the ids into catalog positions)
+        rated = {}
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            cursor = self.reader().execute(f'''
+                SELECT user_id, technique_id FROM ratings WHERE user_id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            for user_id, technique_id in cursor:
+                rated.setdefault(user_id, []).append(technique_id)
+        return rated
+
+    @timed('Database.get_user_ratings_many', rows=lambda ratings: sum(map(len, ratings.values())))
+    def get_user_ratings_many(self, user_ids):
+        # {user_id: [(technique name, rating)]} for a block of users
+        ratings = {}
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            cursor = self.reader().execute(f'''
+                SELECT r.user_id, t.name, r.rating
+                FROM ratings r
+                JOIN techniques t ON r.technique_id = t.id
+                WHERE r.user_id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            for user_id, name, rating in cursor:
+                ratings.setdefault(user_id, []).append((name, rating))
+        return ratings
+
+    @timed('Database.ratings_fingerprint')
+    def ratings_fingerprint(self):
+        # Changes whenever ratings are inserted, replaced (new rowid) or deleted
+        cursor = self.reader().execute('SELECT COUNT(*), COALESCE(MAX(rowid), 0), COALESCE(SUM(rating), 0) FROM ratings')
+        return list(cursor.fetchone())
+
+    def count_ratings(self):
+        return self.reader().execute('SELECT COUNT(*) FROM ratings').fetchone()[0]
+
+    def iter_rating_chunks(self, chunk_size=65536, ordered=False):
+        # Raw (user_id, technique_id, rating) rows, chunk_size at a time; ordered returns
+        # them in write order (INSERT OR REPLACE gives a replaced rating a new rowid)
+        order = ' ORDER BY rowid' if ordered else ''
+        cursor = self.reader().execute(f'SELECT user_id, technique_id, rating FROM ratings{order}')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def get_dirty_users(self):
+        # [(user_id, seq)] for every user whose ratings changed since their last refresh
+        return self.reader().execute('SELECT user_id, seq FROM dirty_users ORDER BY user_id').fetchall()
+
+    def get_recommendation_state(self):
+        # (model_version, model_key, depth) of the last full refresh, or None
+        return self.reader().execute(
+            'SELECT model_version, model_key, depth FROM recommendation_state WHERE id = 0').fetchone()
+
+    def write_recommendations(self, user_ids, rows, dirty=(), state=None):
+        # Replaces the materialized rows of user_ids with rows = (user_id, rank,
+        # technique_id, score, model_version) and clears the (user_id, seq) dirty marks
+        # they cover, in one transaction. state=(model_version, model_key, depth) records
+        # a completed full refresh.
+        with self.transaction():
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                self.conn.execute(f"DELETE FROM recommendations WHERE user_id IN ({', '.join('?' * len(chunk))})",
+                                  chunk)
+            self.conn.executemany('''
+                INSERT INTO recommendations (user_id, rank, technique_id, score, model_version)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            self.conn.executemany('DELETE FROM dirty_users WHERE user_id = ? AND seq = ?', dirty)
+            if state is not None:
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO recommendation_state (id, model_version, model_key, depth)
+                    VALUES (0, ?, ?, ?)
+                ''', state)
+
+    @timed('Database.get_recommendations', rows=len)
+    def get_recommendations(self, user_id, k=5):
+        # Materialized recommendations: one primary-key range read, no model needed
+        cursor = self.reader().execute('''
+            SELECT t.name
+            FROM recommendations r
+            JOIN techniques t ON r.technique_id = t.id
+            WHERE r.user_id = ? AND r.rank < ?
+            ORDER BY r.rank
+        ''', (user_id, k))
+        return [name for name, in cursor]
+
+    @timed('Database.get_recommendations_many', rows=len)
+    def get_recommendations_many(self, user_ids, k=5):
+        # {user_id: [technique names]} for a block of users; users without materialized
+        # rows map to []
+        recommendations = {user_id: [] for user_id in user_ids}
+        user_ids = list(recommendations)
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            cursor = self.reader().execute(f'''
+                SELECT r.user_id, t.name
+                FROM recommendations r
+                JOIN techniques t ON r.technique_id = t.id
+                WHERE r.user_id IN ({', '.join('?' * len(chunk))}) AND r.rank < ?
+                ORDER BY r.user_id, r.rank
+            ''', chunk + [k])
+            for user_id, name in cursor:
+                recommendations[user_id].append(name)
+        return recommendations
+
+    def get_technique_names(self):
+        return dict(self.reader().execute('SELECT id, name FROM techniques'))
+
+    @timed('Database.get_all_ratings', rows=len)
     def get_all_ratings(self):
-        cursor = self.conn.execute('''
+        cursor = self.reader().execute('''
             SELECT r.user_id, t.name, r.rating
             FROM ratings r
             JOIN techniques t ON r.technique_id = t.id
@@ -120,468 +592,684 @@ class Database:
         return cursor.fetchall()
 
     def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        if self.performance:
+            self.conn.execute('PRAGMA optimize')
         self.conn.close()
 
 
 
+class RatingWriteQueue:
+    # Group commit for ratings. submit() returns a Future right away; one writer thread
+    # takes up to max_batch pending ratings (waiting at most max_delay after the first for
+    # more to arrive) and writes them in one transaction, so a burst of ratings costs one
+    # commit instead of one each. After the commit, on_batch(rows) hooks run once for the
+    # whole batch (e.g. MatrixFactorizationRecommender.fold_in_many), and only then are
+    # the futures resolved: True once the rating is durable, False for an unknown
+    # technique. Rating listeners on the Database also fire once per batch.
+    def __init__(self, db, max_batch=1000, max_delay=0.005, on_batch=()):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_batch = list(on_batch)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='bjj-rating-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, technique_name, rating):
+        if self._closed:
+            raise RuntimeError('rating queue is closed')
+        future = Future()
+        self._queue.put((user_id, technique_name, rating, future))
+        return future
+
+    def add_rating(self, user_id, technique_name, rating):
+        # Blocking form with Database.add_rating's result
+        return self.submit(user_id, technique_name, rating).result()
+
+    def close(self):
+        # Writes everything already submitted, then stops the writer thread
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                logger.exception('Writing %d ratings failed', len(batch))
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if stop:
+                return
+
+    @timed('RatingWriteQueue.write_batch', rows=int)
+    def _write_batch(self, batch):
+        rows, written, accepted = [], [], []
+        for user_id, technique_name, rating, future in batch:
+            technique_id = self.db.get_technique_id(technique_name)
+            if technique_id is None:
+                future.set_result(False)
+                continue
+            rows.append((user_id, technique_id, rating))
+            written.append((user_id, technique_name, rating))
+            accepted.append(future)
+        if rows:
+            self.db._write_ratings(rows, written)
+            for callback in self.on_batch:
+                try:
+                    callback(written)
+                except Exception:
+                    logger.exception('Rating batch hook failed')
+        for future in accepted:
+            future.set_result(True)
+        return len(rows)
+
+
+class RecommendationCache:
+    # LRU + TTL cache of top-K lists keyed by (user_id, k, model_version). Entries are
+    # dropped per user when that user rates something, and wholesale on model swaps.
+    def __init__(self, max_size=1024, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(value)
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, list(value))
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                for key in self._keys_by_user.pop(user_id, ()):
+                    del self._entries[key]
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key):
+        del self._entries[key]
+        keys = self._keys_by_user[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[key[0]]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'expirations': self.expirations,
+                    'invalidations': self.invalidations}
+
+
+class PopularityRanker:
+    # Cold-start ranking from the technique_stats counters. Each technique's score is a
+    # Bayesian average: the global slice is shrunk towards the overall mean rating, then
+    # the user's level and skill slices are shrunk towards the score before them, with
+    # prior_weight pseudo-ratings each time. Slices are read once and re-read only after
+    # ratings have been written.
+    def __init__(self, db, catalog, prior_weight=5.0):
+        self.db = db
+        self.catalog = catalog
+        self.prior_weight = prior_weight
+        self._lock = threading.Lock()
+        self._slices = {}
+        # (skill, level) -> catalog positions, best first
+        self._rankings = {}
+        db.add_rating_listener(self._on_ratings_written)
+
+    def _on_ratings_written(self, rows):
+        with self._lock:
+            self._slices.clear()
+            self._rankings.clear()
+
+    def _slice(self, stat_slice):
+        counts = self._slices.get(stat_slice)
+        if counts is None:
+            n, total = np.zeros((2, len(self.catalog)))
+            for name, (count, rating_sum) in self.db.get_technique_stats(stat_slice).items():
+                position = self.catalog.index.get(name)
+                if position is not None:
+                    n[position], total[position] = count, rating_sum
+            counts = self._slices[stat_slice] = (n, total)
+        return counts
+
+    def _shrink(self, n, total, prior):
+        return (self.prior_weight * prior + total) / (self.prior_weight + n)
+
+    def scores(self, skill=None, level=None):
+        n, total = self._slice(GLOBAL_SLICE)
+        mean = total.sum() / n.sum() if n.sum() else sum(RATING_SCALE) / 2
+        scores = self._shrink(n, total, mean)
+        for stat_slice in stat_slices(skill, level)[1:]:
+            scores = self._shrink(*self._slice(stat_slice), scores)
+        return scores
+
+    def ranking(self, skill=None, level=None):
+        # (catalog positions best first, scores) for a profile
+        key = (skill or None, level or None)
+        with self._lock:
+            ranking = self._rankings.get(key)
+            if ranking is None:
+                scores = self.scores(skill, level)
+                ranking = self._rankings[key] = (np.argsort(-scores, kind='stable').tolist(), scores)
+        return ranking
+
+    def top_positions(self, k, skill=None, level=None, exclude=()):
+        # exclude: catalog positions
+        order, _ = self.ranking(skill, level)
+        exclude = set(exclude)
+        positions = []
+        for pos in order:
+            if len(positions) == k:
+                break
+            if pos not in exclude:
+                positions.append(pos)
+        return positions
+
+    def top(self, k, skill=None, level=None, exclude=()):
+        return [self.catalog.names[pos] for pos in self.top_positions(k, skill, level, exclude)]
+
+
+class ModelTrainer(threading.Thread):
+    # Retrains off the GUI thread. Requests arriving within `debounce` seconds of each
+    # other are coalesced into one retrain, but a retrain is never postponed by more
+    # than `max_delay` seconds while ratings keep coming in.
+    def __init__(self, recommender, debounce=2.0, max_delay=30.0):
+        super().__init__(name='bjj-model-trainer', daemon=True)
+        self.recommender = recommender
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._due = None
+        self._deadline = None
+        self._stopped = False
+        self.start()
+
+    def request(self, immediate=False):
+        with self._cond:
+            now = time.monotonic()
+            if self._deadline is None:
+                self._deadline = now + self.max_delay
+            self._due = now if immediate else min(now + self.debounce, self._deadline)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.join()
+
+    def _wait_for_request(self):
+        with self._cond:
+            while not self._stopped:
+                if self._due is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._due - time.monotonic()
+                if remaining <= 0:
+                    self._due = self._deadline = None
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+    def run(self):
+        # With a connection pool this thread gets its own reader; otherwise give it a
+        # private connection rather than sharing the GUI's. A new connection to ':memory:'
+        # would be a new, empty database, so in-memory databases share the caller's.
+        shared = self.recommender.db
+        db = shared if shared.pool is not None or shared.db_name == ':memory:' else Database(shared.db_name)
+        try:
+            while self._wait_for_request():
+                try:
+                    self.recommender.retrain(db)
+                except Exception:
+                    logger.exception('Background model training failed')
+        finally:
+            if db is not shared:
+                db.close()
+
+
 class MatrixFactorizationRecommender:
-    def __init__(self, db):
+    def __init__(self, db, params=None, retrain_every=200, drift_threshold=0.1,
+                 background=False, debounce=2.0, catalog=None, cache_size=1024, cache_ttl=300.0,
+                 checkpoint_dir=None, backend='sgd', n_neighbors=20, neighbor_seed_ratings=2, compact=None):
         self.db = db
-        self.update_model()
+        self.backend = backend
+        self.checkpoint_dir = checkpoint_dir
+        # compact: None keeps the float64 model; 'float32' or 'int8' serves from a
+        # CompactFactorModel (checkpoints are still written at full precision)
+        self.compact = compact
+        # catalog: a Catalog or a {category: [names]} dict; its dense ids are the item
+        # positions used by the model, the neighbor index and the popularity ranker
+        if catalog is None:
+            catalog = technique_catalog
+        self.catalog = catalog if isinstance(catalog, Catalog) else Catalog(catalog)
+        # This database's techniques.id per catalog position
+        self.catalog_ids = db.catalog_ids(self.catalog)
+        self.params = dict(default_params(backend), **(params or {}))
+        # Checkpoints trained with another backend or other parameters are stale
+        self.trained_with = training_config(backend, self.params)
+        self.fold_in_params = dict(self.params, **FOLD_IN_PARAMS.get(backend, {}))
+        # Full retrains happen after this many folded-in ratings, or once the folded-in
+        # ratings exceed this fraction of the ratings the model was trained on
+        self.retrain_every = retrain_every
+        self.drift_threshold = drift_threshold
+        # Users with at most this many ratings get half their recommendations from the
+        # neighbors of what they rated; their own factors are mostly noise at that point
+        self.n_neighbors = n_neighbors
+        self.neighbor_seed_ratings = neighbor_seed_ratings
+        self.folded_ratings = 0
+        self.model = None
+        self.neighbors = None
+        self.model_version = 0
+        self.last_trained = None
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._pending_folds = None
+        self.cache = RecommendationCache(cache_size, cache_ttl)
+        self.popularity = PopularityRanker(db, self.catalog)
+        db.add_rating_listener(self._on_ratings_written)
+        self.trainer = None
+        checkpoint = None
+        if checkpoint_dir is not None:
+            checkpoint = load_checkpoint(checkpoint_dir, db.ratings_fingerprint(), compact=compact,
+                                         trained_with=self.trained_with)
+        if checkpoint is not None:
+            # The ratings haven't changed since this checkpoint was trained
+            self._swap(checkpoint)
+        if background:
+            # Start with no model (cold-start recommendations) and train off-thread
+            self.trainer = ModelTrainer(self, debounce=debounce)
+            if checkpoint is None:
+                self.trainer.request(immediate=True)
+        elif checkpoint is None:
+            self.update_model()
+
+    def add_listener(self, callback):
+        # callback(model_version, last_trained) runs on whichever thread swapped the model
+        self.listeners.append(callback)
 
     def update_model(self):
-        ratings = self.db.get_all_ratings()
-        if not ratings:
+        self.retrain(self.db)
+
+    def request_retrain(self):
+        if self.trainer is not None:
+            self.trainer.request()
+        else:
+            self.update_model()
+
+    def retrain(self, db):
+        with self._lock:
+            # Ratings folded in while we train are replayed onto the new model
+            self._pending_folds = []
+        try:
+            model = self.build_model(db)
+            if model is not None and self.checkpoint_dir is not None:
+                model.align_items(self.catalog.names)
+                save_checkpoint(model, self.checkpoint_dir)
+        except Exception:
+            with self._lock:
+                self._pending_folds = None
+            raise
+        self._swap(model)
+
+    @timed('Recommender.build_model')
+    def build_model(self, db):
+        fingerprint = db.ratings_fingerprint()
+        data = load_ratings(db)
+        if not len(data):
             # If there are no ratings yet, we can't build a model
-            self.model = None
-            return
+            return None
 
-        df = pd.DataFrame(ratings, columns=['user', 'item', 'rating'])
-        reader = Reader(rating_scale=(1, 5))
-        self.data = Dataset.load_from_df(df[['user', 'item', 'rating']], reader)
-        self.model = SVD(n_factors=20, n_epochs=20, lr_all=0.005, reg_all=0.02)
-        self.model.fit(self.data.build_full_trainset())
+        model = TRAINERS[self.backend](data, **self.params)
+        model.fingerprint = fingerprint
+        model.trained_with = self.trained_with
+        return model
 
-    def recommend_techniques(self, user_id, k=5):
+    def _swap(self, model):
+        # Conversion and alignment touch only the new model, so they run before the lock;
+        # it is held just for replaying pending folds and publishing the model
+        if model is not None:
+            if self.compact is not None and not isinstance(model, CompactFactorModel):
+                model = CompactFactorModel.from_model(model, self.compact)
+            model.align_items(self.catalog.names)
+        with self._lock:
+            pending, self._pending_folds = self._pending_folds or [], None
+            if model is not None:
+                for user_id, user_ratings, technique, rating in pending:
+                    model.fold_in(user_id, user_ratings, technique, rating, **self.fold_in_params)
+            self.folded_ratings = len(pending) if model is not None else 0
+            self.model = model
+            self.neighbors = ItemNeighborIndex.build(model, self.n_neighbors) if model is not None else None
+            self.model_version += 1
+            self.last_trained = time.time()
+            version, trained = self.model_version, self.last_trained
+        self.cache.clear()
+        metrics.set_gauge('model_version', version)
+        if model is not None:
+            metrics.set_gauge('model_bytes', model.nbytes)
+            metrics.set_gauge('model_users', len(model.user_ids))
+            metrics.set_gauge('model_items', len(model.item_names))
+            metrics.set_gauge('neighbor_index_bytes', self.neighbors.nbytes)
+        for callback in self.listeners:
+            callback(version, trained)
+
+    def _on_ratings_written(self, rows):
+        self.cache.invalidate_users({user_id for user_id, _, _ in rows})
+
+    @timed('Recommender.fold_in')
+    def fold_in(self, user_id, technique, rating):
+        self.fold_in_many([(user_id, technique, rating)])
+
+    @timed('Recommender.fold_in_many', rows=len)
+    def fold_in_many(self, rows):
+        # rows: (user_id, technique name, rating) already written. The users' ratings are
+        # read in one query, the model is updated under one lock acquisition and the
+        # neighbor rows of the touched techniques are recomputed once.
+        rows = list(rows)
+        user_ratings = self.db.get_user_ratings_many({user_id for user_id, _, _ in rows})
+        folds = [(user_id, user_ratings.get(user_id, []), technique, rating) for user_id, technique, rating in rows]
+        with self._lock:
+            if self._pending_folds is not None:
+                self._pending_folds.extend(folds)
+            if self.model is not None:
+                for fold in folds:
+                    self.model.fold_in(*fold, **self.fold_in_params)
+                self.folded_ratings += len(folds)
+                positions = sorted({self.catalog.index[technique] for _, technique, _ in rows
+                                    if technique in self.catalog.index})
+                if positions:
+                    self.neighbors.update(self.model, positions)
+            retrain = self.needs_retrain()
+        # The write already dropped these users' cached lists, but a lookup in between
+        # could have cached one scored with their old factors
+        self.cache.invalidate_users({user_id for user_id, _, _ in rows})
+        if retrain:
+            self.request_retrain()
+        return len(rows)
+
+    def needs_retrain(self):
         if self.model is None:
-            # If we don't have a model, return random techniques
-            all_techniques = [technique for category in techniques.values() for technique in category]
-            return random.sample(all_techniques, k)
-
-        user_ratings = dict(self.db.get_user_ratings(user_id))
-        all_techniques = set(technique for category in techniques.values() for technique in category)
-        unrated_techniques = all_techniques - set(user_ratings.keys())
-        
-        predictions = []
-        for technique in unrated_techniques:
-            predicted_rating = self.model.predict(user_id, technique).est
-            predictions.append((technique, predicted_rating))
-        
-        return [technique for technique, _ in sorted(predictions, key=lambda x: x[1], reverse=True)[:k]]
-
-class BJJRecommenderGUI(QWidget):
-    def __init__(self, db):
-        super().__init__()
-        self.db = db
-        self.user_id = None
-        self.recommender = MatrixFactorizationRecommender(db)
-        self.initUI()
-
-
-    def initUI(self):
-        main_layout = QVBoxLayout()
-
-        # Login/Register section
-        login_layout = QHBoxLayout()
-        self.username_input = QLineEdit()
-        self.password_input = QLineEdit()
-        self.password_input.setEchoMode(QLineEdit.Password)
-        login_button = QPushButton('Login')
-        register_button = QPushButton('Register')
-        login_button.clicked.connect(self.login)
-        register_button.clicked.connect(self.register)
-        login_layout.addWidget(QLabel('Username:'))
-        login_layout.addWidget(self.username_input)
-        login_layout.addWidget(QLabel('Password:'))
-        login_layout.addWidget(self.password_input)
-        login_layout.addWidget(login_button)
-        login_layout.addWidget(register_button)
-        main_layout.addLayout(login_layout)
-
-        # Skill input
-        skill_layout = QHBoxLayout()
-        skill_layout.addWidget(QLabel('Primary BJJ Skill:'))
-        self.skill_input = QLineEdit()
-        skill_layout.addWidget(self.skill_input)
-        main_layout.addLayout(skill_layout)
-
-        # Level input
-        level_layout = QHBoxLayout()
-        level_layout.addWidget(QLabel('BJJ Level:'))
-        self.level_input = QComboBox()
-        self.level_input.addItems(['Beginner', 'Intermediate', 'Advanced'])
-        level_layout.addWidget(self.level_input)
-        main_layout.addLayout(level_layout)
-
-        # Techniques input
-        techniques_layout = QHBoxLayout()
-        techniques_layout.addWidget(QLabel('Preferred Techniques (comma-separated):'))
-        self.techniques_input = QLineEdit()
-        techniques_layout.addWidget(self.techniques_input)
-        main_layout.addLayout(techniques_layout)
-
-        # Weaknesses/Goals input
-        weaknesses_layout = QHBoxLayout()
-        weaknesses_layout.addWidget(QLabel('Weaknesses/Goals (comma-separated):'))
-        self.weaknesses_input = QLineEdit()
-        weaknesses_layout.addWidget(self.weaknesses_input)
-        main_layout.addLayout(weaknesses_layout)
-
-        # Rate technique section
-        rate_layout = QHBoxLayout()
-        self.technique_to_rate = QLineEdit()
-        self.rating_input = QComboBox()
-        self.rating_input.addItems(['1', '2', '3', '4', '5'])
-        rate_button = QPushButton('Rate Technique')
-        rate_button.clicked.connect(self.rate_technique)
-        rate_layout.addWidget(QLabel('Technique to rate:'))
-        rate_layout.addWidget(self.technique_to_rate)
-        rate_layout.addWidget(QLabel('Rating:'))
-        rate_layout.addWidget(self.rating_input)
-        rate_layout.addWidget(rate_button)
-        main_layout.addLayout(rate_layout)
-
-        # Submit button
-        self.submit_button = QPushButton('Get Recommendations')
-        self.submit_button.clicked.connect(self.get_recommendations)
-        main_layout.addWidget(self.submit_button)
-
-        # Results display
-        self.results_display = QTextEdit()
-        self.results_display.setReadOnly(True)
-        main_layout.addWidget(self.results_display)
-
-        self.setLayout(main_layout)
-        self.setWindowTitle('BJJ Technique Recommender')
-        self.show()
-
-                # Strength & Conditioning section
-        sc_layout = QHBoxLayout()
-        sc_layout.addWidget(QLabel('Strength & Conditioning Method:'))
-        self.sc_method_input = QComboBox()
-        self.sc_method_input.addItems(list(S_C_METHODS.keys()))
-        sc_layout.addWidget(self.sc_method_input)
-        main_layout.addLayout(sc_layout)
-
-        # S&C Recommendation button
-        self.sc_recommend_button = QPushButton('Get S&C Recommendations')
-        self.sc_recommend_button.clicked.connect(self.get_sc_recommendations)
-        main_layout.addWidget(self.sc_recommend_button)
-
-
-
-    def login(self):
-        username = self.username_input.text()
-        password = self.password_input.text()
-        user_id = self.db.verify_user(username, password)
-        if user_id:
-            self.user_id = user_id
-            QMessageBox.information(self, 'Success', 'Logged in successfully!')
-        else:
-            QMessageBox.warning(self, 'Error', 'Invalid username or password')
+            return True
+        return (self.folded_ratings >= self.retrain_every or
+                self.folded_ratings > self.drift_threshold * self.model.n_ratings)
 
-    def register(self):
-        username = self.username_input.text()
-        password = self.password_input.text()
-        skill = self.skill_input.text()
-        level = self.level_input.currentText().lower()
-        try:
-            self.db.add_user(username, password, skill, level)
-            QMessageBox.information(self, 'Success', 'Registered successfully! You can now log in.')
-        except sqlite3.IntegrityError:
-            QMessageBox.warning(self, 'Error', 'Username already exists')
-
-    def rate_technique(self):
-        if not self.user_id:
-            QMessageBox.warning(self, 'Error', 'Please log in first')
-            return
-        technique = self.technique_to_rate.text()
-        rating = int(self.rating_input.currentText())
-        if self.db.add_rating(self.user_id, technique, rating):
-            QMessageBox.information(self, 'Success', 'Rating added successfully!')
-            self.recommender.update_model()
-        else:
-            QMessageBox.warning(self, 'Error', 'Invalid technique name')
-
-    def get_sc_recommendations(self):
-        if not self.user_id:
-            QMessageBox.warning(self, 'Error', 'Please log in first')
-            return
-        
-        selected_method = self.sc_method_input.currentText()
-        skill, level = self.db.get_user_info(self.user_id)
-        
-        sc_plan = create_sc_plan(selected_method, skill, level)
-        
-        results = f"Strength & Conditioning Plan ({selected_method}):\n\n"
-        results += sc_plan
-        
-        self.results_display.setText(results)
-
-
-    def get_recommendations(self):
-        if not self.user_id:
-            QMessageBox.warning(self, 'Error', 'Please log in first')
-            return
-        
-        skill, level = self.db.get_user_info(self.user_id)
-        weaknesses = [w.strip() for w in self.weaknesses_input.text().split(',')]
-
-        recommended_techniques = self.recommender.recommend_techniques(self.user_id)
-        periodized_plan = create_periodized_plan(skill, level, weaknesses)
-        weekly_plan = create_weekly_plan(skill, level, recommended_techniques, weaknesses)
-        
-        selected_method = self.sc_method_input.currentText()
-        sc_plan = create_sc_plan(selected_method, skill, level)
-
-        results = f"Recommended techniques:\n"
-        for technique in recommended_techniques:
-            results += f"- {technique}\n"
-        
-        results += "\nPeriodized Training Plan:\n"
-        for week in periodized_plan:
-            results += f"{week}\n"
-        
-        results += "\nWeekly Training Plan:\n"
-        for session in weekly_plan:
-            results += f"{session}\n"
-        
-        results += f"\nStrength & Conditioning Plan ({selected_method}):\n"
-        results += sc_plan
-
-        self.results_display.setText(results)
-
-
-def create_sc_plan(method, skill, level):
-    plan = f"{method} Plan for {skill.capitalize()} focused {level.capitalize()} BJJ practitioner:\n\n"
-    
-    if method == "Dynamic Effort Method":
-        plan += dynamic_effort_method(level)
-    elif method == "Conjugate Method (Westside Barbell)":
-        plan += conjugate_method(level)
-    elif method == "Linear Periodization":
-        plan += linear_periodization(level)
-    elif method == "Undulating Periodization":
-        plan += undulating_periodization(level)
-    elif method == "Block Periodization":
-        plan += block_periodization(level)
-    
-    plan += "\nNote: Adjust weights based on your current strength levels and recovery ability."
-    plan += "\nAlways warm up properly and maintain good form throughout your workouts."
-    plan += "\nConsult with a certified strength and conditioning coach to tailor this plan to your specific needs."
-    
-    return plan
-
-
-def dynamic_effort_method(level):
-    plan = "12-Week Plan:\n\n"
-    
-    olympic_lifts = ["Power Clean", "Hang Snatch", "Clean and Jerk"]
-    compound_exercises = ["Squat", "Bench Press", "Deadlift", "Overhead Press"]
-    accessory_exercises = ["Pull-ups", "Dips", "Barbell Row", "Lunges"]
-    
-    if level == "beginner":
-        intensity = "40-50% 1RM"
-        volume = "3x3"
-    elif level == "intermediate":
-        intensity = "50-60% 1RM"
-        volume = "4x3"
-    else:  # advanced
-        intensity = "60-70% 1RM"
-        volume = "5x3"
-    
-    plan += f"Weeks 1-4 (Speed Strength Focus):\n"
-    plan += f"- Monday: {random.choice(olympic_lifts)} {volume} @ {intensity}, Speed Squat 8x2 @ {intensity}, {random.choice(accessory_exercises)} 3x10\n"
-    plan += f"- Wednesday: {random.choice(olympic_lifts)} {volume} @ {intensity}, Speed Bench 8x3 @ {intensity}, {random.choice(accessory_exercises)} 3x10\n"
-    plan += f"- Friday: {random.choice(olympic_lifts)} {volume} @ {intensity}, Speed Deadlift 8x2 @ {intensity}, {random.choice(accessory_exercises)} 3x10\n\n"
-    
-    plan += "Weeks 5-8: Increase intensity by 5%, reduce rest times\n"
-    plan += "Weeks 9-12: Increase bar speed, maintain intensity\n"
-    
-    return plan
-
-def conjugate_method(level):
-    plan = "12-Week Plan:\n\n"
-    
-    max_effort_exercises = ["Box Squat", "Floor Press", "Rack Deadlift", "Good Morning"]
-    dynamic_effort_exercises = ["Speed Squat", "Speed Bench", "Speed Deadlift"]
-    olympic_lifts = ["Power Clean", "Hang Snatch", "Clean and Jerk"]
-    accessory_exercises = ["Pull-ups", "Dips", "Barbell Row", "Lunges"]
-    
-    if level == "beginner":
-        me_intensity = "80-85% 1RM"
-        de_intensity = "50-60% 1RM"
-    elif level == "intermediate":
-        me_intensity = "85-90% 1RM"
-        de_intensity = "60-70% 1RM"
-    else:  # advanced
-        me_intensity = "90-95% 1RM"
-        de_intensity = "70-80% 1RM"
-    
-    plan += "Week 1 Example:\n"
-    plan += f"- Monday (ME Lower): {random.choice(max_effort_exercises)} 5x3 @ {me_intensity}, {random.choice(olympic_lifts)} 3x3, {random.choice(accessory_exercises)} 3x10\n"
-    plan += f"- Wednesday (DE Upper): {random.choice(dynamic_effort_exercises)} 8x3 @ {de_intensity}, {random.choice(olympic_lifts)} 3x3, {random.choice(accessory_exercises)} 3x10\n"
-    plan += f"- Friday (DE Lower): {random.choice(dynamic_effort_exercises)} 8x2 @ {de_intensity}, {random.choice(olympic_lifts)} 3x3, {random.choice(accessory_exercises)} 3x10\n\n"
-    
-    plan += "Rotate exercises every 1-3 weeks for ME days\n"
-    plan += "Gradually increase bar speed and/or weight for DE days\n"
-    
-    return plan
-
-def linear_periodization(level):
-    plan = "12-Week Plan:\n\n"
-    
-    olympic_lifts = ["Power Clean", "Hang Snatch", "Clean and Jerk"]
-    compound_exercises = ["Squat", "Bench Press", "Deadlift", "Overhead Press"]
-    accessory_exercises = ["Pull-ups", "Dips", "Barbell Row", "Lunges"]
-    
-    if level == "beginner":
-        hypertrophy = "3x10-12 @ 65-70% 1RM"
-        strength = "4x6-8 @ 75-80% 1RM"
-        power = "5x3-5 @ 80-85% 1RM"
-    elif level == "intermediate":
-        hypertrophy = "4x10-12 @ 70-75% 1RM"
-        strength = "5x6-8 @ 77-82% 1RM"
-        power = "6x3-5 @ 82-87% 1RM"
-    else:  # advanced
-        hypertrophy = "5x10-12 @ 72-77% 1RM"
-        strength = "6x6-8 @ 80-85% 1RM"
-        power = "7x3-5 @ 85-90% 1RM"
-    
-    plan += f"Weeks 1-4 (Hypertrophy):\n"
-    plan += f"- Monday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n"
-    plan += f"- Wednesday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n"
-    plan += f"- Friday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n\n"
-    
-    plan += f"Weeks 5-8 (Strength): Same structure, but {strength}\n"
-    plan += f"Weeks 9-12 (Power): Same structure, but {power}\n"
-    
-    return plan
-
-def undulating_periodization(level):
-    plan = "Weekly Plan (repeat for 12 weeks):\n\n"
-    
-    olympic_lifts = ["Power Clean", "Hang Snatch", "Clean and Jerk"]
-    compound_exercises = ["Squat", "Bench Press", "Deadlift", "Overhead Press"]
-    accessory_exercises = ["Pull-ups", "Dips", "Barbell Row", "Lunges"]
-    
-    if level == "beginner":
-        hypertrophy = "3x10-12 @ 65-70% 1RM"
-        strength = "4x6-8 @ 75-80% 1RM"
-        power = "5x3-5 @ 80-85% 1RM"
-    elif level == "intermediate":
-        hypertrophy = "4x10-12 @ 70-75% 1RM"
-        strength = "5x6-8 @ 77-82% 1RM"
-        power = "6x3-5 @ 82-87% 1RM"
-    else:  # advanced
-        hypertrophy = "5x10-12 @ 72-77% 1RM"
-        strength = "6x6-8 @ 80-85% 1RM"
-        power = "7x3-5 @ 85-90% 1RM"
-    
-    plan += f"- Monday (Hypertrophy): {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n"
-    plan += f"- Wednesday (Strength): {random.choice(olympic_lifts)} {strength}, {random.choice(compound_exercises)} {strength}, {random.choice(accessory_exercises)} 3x10\n"
-    plan += f"- Friday (Power): {random.choice(olympic_lifts)} {power}, {random.choice(compound_exercises)} {power}, {random.choice(accessory_exercises)} 3x8\n"
-    
-    plan += "\nRotate exercises weekly while maintaining the undulating structure\n"
-    
-    return plan
-
-def block_periodization(level):
-    plan = "12-Week Plan:\n\n"
-    
-    olympic_lifts = ["Power Clean", "Hang Snatch", "Clean and Jerk"]
-    compound_exercises = ["Squat", "Bench Press", "Deadlift", "Overhead Press"]
-    accessory_exercises = ["Pull-ups", "Dips", "Barbell Row", "Lunges"]
-    
-    if level == "beginner":
-        hypertrophy = "3x10-12 @ 65-70% 1RM"
-        strength = "4x6-8 @ 75-80% 1RM"
-        power = "5x3-5 @ 80-85% 1RM"
-    elif level == "intermediate":
-        hypertrophy = "4x10-12 @ 70-75% 1RM"
-        strength = "5x6-8 @ 77-82% 1RM"
-        power = "6x3-5 @ 82-87% 1RM"
-    else:  # advanced
-        hypertrophy = "5x10-12 @ 72-77% 1RM"
-        strength = "6x6-8 @ 80-85% 1RM"
-        power = "7x3-5 @ 85-90% 1RM"
-    
-    plan += f"Weeks 1-4 (Hypertrophy Block):\n"
-    plan += f"- Monday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n"
-    plan += f"- Wednesday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n"
-    plan += f"- Friday: {random.choice(olympic_lifts)} {hypertrophy}, {random.choice(compound_exercises)} {hypertrophy}, {random.choice(accessory_exercises)} 3x12\n\n"
-    
-    plan += f"Weeks 5-8 (Strength Block): Same structure, but {strength}\n"
-    plan += f"Weeks 9-12 (Power Block): Same structure, but {power}\n"
-    
-    plan += "\nFocus on increasing weight and/or volume each week within each block\n"
-    
-    return plan
-
-
-
-def create_periodized_plan(skill, level, weaknesses):
-    weeks = 4 if level == "beginner" else 6 if level == "intermediate" else 8
-    plan = []
-    for week in range(1, weeks + 1):
-        plan.append(f"Week {week}:")
-        plan.append("  Monday: High Intensity - Upper Body Focus")
-        plan.append("  Tuesday: Technical - Lower Body Focus")
-        plan.append("  Wednesday: Active Recovery")
-        plan.append("  Thursday: High Volume - Submissions Focus")
-        plan.append("  Friday: Technical - Guard and Takedowns")
-        plan.append("  Saturday: Competition Simulation")
-        plan.append("  Sunday: Rest")
-        
-        # Add focus on weaknesses/goals
-        if weaknesses:
-            weakness_focus = random.choice(weaknesses)
-            plan.append(f"  Weakness Focus: {weakness_focus}")
-    return plan
-
-def create_weekly_plan(skill, level, recommended_techniques, weaknesses):
-    days = ["Monday", "Tuesday", "Thursday", "Friday", "Saturday"]
-    focus_areas = ["Upper Body", "Lower Body", "Submissions", "Guard", "Takedowns"]
-    weekly_plan = []
-    
-    for day, focus in zip(days, focus_areas):
-        intensity = "High Intensity" if day in ["Monday", "Thursday"] else "Technical"
-        focus_techniques = [t for t in recommended_techniques if any(t.startswith(f"{gi_nogi}: ") for gi_nogi in ["Gi", "No-Gi"]) and t.split(": ")[1] in techniques[focus]]
-        if not focus_techniques:
-            focus_techniques = [f"{gi_nogi}: {t}" for gi_nogi in ["Gi", "No-Gi"] for t in random.sample(techniques[focus], 2)]
+    def close(self):
+        if self.trainer is not None:
+            self.trainer.stop()
+            self.trainer = None
+
+    @timed('Recommender.recommend_techniques')
+    def recommend_techniques(self, user_id, k=5):
+        # Read the model once so a concurrent swap can't mix two models in one ranking
+        with self._lock:
+            model, version, neighbors = self.model, self.model_version, self.neighbors
+        if model is None:
+            # Until a model is trained, everyone gets the popularity ranking for their profile
+            return self.recommend_popular(user_id, k, self._rated_positions(user_id))
+
+        key = (user_id, k, version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        rated = self._rated_positions(user_id)
+        if not len(rated):
+            # The model knows nothing about users without ratings beyond the item biases
+            recommendations = self.recommend_popular(user_id, k)
+            self.cache.put(key, recommendations)
+            return recommendations
+        scores = model.score_items(user_id)
+        scores[rated] = -np.inf
+        recommendations = [self.catalog.names[pos] for pos, _ in self._rank(scores, rated, k, neighbors)]
+        self.cache.put(key, recommendations)
+        return recommendations
+
+    @timed('Recommender.recommend_many', rows=len)
+    def recommend_many(self, user_ids, k=5, block_size=1024):
+        with self._lock:
+            model, version, neighbors = self.model, self.model_version, self.neighbors
+        user_ids = list(user_ids)
+        if model is None:
+            return {user_id: self.recommend_techniques(user_id, k) for user_id in user_ids}
+
+        recommendations = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.cache.get((user_id, k, version))
+            if cached is None:
+                missing.append(user_id)
+            else:
+                recommendations[user_id] = cached
+        for start in range(0, len(missing), block_size):
+            block = missing[start:start + block_size]
+            for user_id, ranked in self.rank_block(model, neighbors, block, k).items():
+                recommendations[user_id] = [self.catalog.names[pos] for pos, _ in ranked]
+                self.cache.put((user_id, k, version), recommendations[user_id])
+        return {user_id: recommendations[user_id] for user_id in user_ids}
+
+    def snapshot(self):
+        # (model, neighbors) as one consistent pair for rank_block
+        with self._lock:
+            return self.model, self.neighbors
+
+    def rank_block(self, model, neighbors, block, k):
+        # {user_id: [(catalog position, score)] best first} for a block of users, with what
+        # they rated left out. Users without ratings (everyone, without a model) get the
+        # popularity ranking for their profile, scored by its Bayesian average.
+        rated = {user_id: self.catalog_ids.from_db_ids(technique_ids)
+                 for user_id, technique_ids in self.db.get_rated_technique_ids(block).items()}
+        profiles = self.db.get_user_profiles(block if model is None else
+                                             [user_id for user_id in block if user_id not in rated])
+        if model is None:
+            return {user_id: self._popular(k, profiles.get(user_id), rated.get(user_id, ())) for user_id in block}
+        scores = model.score_users(block)
+        for row, user_id in enumerate(block):
+            if user_id in rated:
+                scores[row, rated[user_id]] = -np.inf
+        ranked = {}
+        best = top_k(scores, k)
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        found = best_scores != -np.inf
+        for row, user_id in enumerate(block):
+            user_rated = rated.get(user_id, ())
+            if not len(user_rated):
+                ranked[user_id] = self._popular(k, profiles.get(user_id))
+            elif self._seeds_from_neighbors(user_rated, neighbors):
+                ranked[user_id] = self._rank(scores[row], user_rated, k, neighbors)
+            else:
+                keep = found[row]
+                ranked[user_id] = list(zip(best[row][keep].tolist(), best_scores[row][keep].tolist()))
+        return ranked
+
+    def _popular(self, k, profile, rated=()):
+        skill, level = profile or (None, None)
+        _, scores = self.popularity.ranking(skill, level)
+        return [(pos, scores[pos]) for pos in self.popularity.top_positions(k, skill, level, exclude=rated)]
+
+    def recommend_popular(self, user_id, k=5, rated=()):
+        # rated: catalog positions to leave out
+        skill, level = self.db.get_user_info(user_id) or (None, None)
+        return self.popularity.top(k, skill, level, exclude=rated)
+
+    def _rated_positions(self, user_id):
+        return self.catalog_ids.from_db_ids(self.db.get_rated_technique_ids([user_id]).get(user_id, ()))
+
+    def _top(self, scores, k):
+        return [(pos, scores[pos]) for pos in top_k(scores, k) if scores[pos] != -np.inf]
+
+    def _seeds_from_neighbors(self, rated, neighbors):
+        return neighbors is not None and 0 < len(rated) <= self.neighbor_seed_ratings
+
+    def _rank(self, scores, rated, k, neighbors):
+        # [(catalog position, score)]; rated: catalog positions, masked to -inf in scores;
+        # scores is modified in place
+        if not self._seeds_from_neighbors(rated, neighbors):
+            return self._top(scores, k)
+        seeds = neighbors.similar_to_any(rated, (k + 1) // 2,
+                                         exclude=scores == -np.inf)
+        seeded = [(pos, scores[pos]) for pos in seeds]
+        scores[seeds] = -np.inf
+        return seeded + self._top(scores, k - len(seeds))
+
+    @timed('Recommender.similar_techniques')
+    def similar_techniques(self, name, k=5):
+        # "You may also like": one row lookup in the neighbor index. Without a model, fall
+        # back to the other techniques in the same category.
+        with self._lock:
+            neighbors = self.neighbors
+        position = self.catalog.index.get(name)
+        if position is None:
+            return []
+        if neighbors is None:
+            same = self.catalog.ids_in(self.catalog.category[position])
+            return [self.catalog.names[pos] for pos in same[same != position][:k]]
+        return [self.catalog.names[pos] for pos, _ in neighbors.similar(position, k)]
+
+class RecommendationRefresher:
+    # Keeps the recommendations table current so exports and other readers can serve
+    # Database.get_recommendations without loading a model. A refresh recomputes only
+    # the users marked dirty by rating writes; when the model the table was built from
+    # has been replaced, or the depth changed, it recomputes everyone. Each block of
+    # users is written, and its dirty marks cleared, in one transaction. Reads of fewer
+    # than depth rows can differ from a live top-k for users seeded from neighbors (the
+    # number of neighbor picks grows with k), so materialize at the depth you read.
+    def __init__(self, recommender, depth=10, block_size=5000):
+        self.recommender = recommender
+        self.depth = depth
+        self.block_size = block_size
+
+    def model_key(self, model):
+        # Identifies the model by what it was trained with (backend and parameters) and the
+        # ratings it was trained on; models loaded from a checkpoint keep the key of the run
+        # that trained them
+        if model is None:
+            return 'popularity'
+        return json.dumps([model.trained_with, model.fingerprint])
+
+    @timed('RecommendationRefresher.refresh', rows=int)
+    def refresh(self, full=False):
+        # Returns the number of users recomputed
+        recommender = self.recommender
+        db = recommender.db
+        model, neighbors = recommender.snapshot()
+        key = self.model_key(model)
+        state = db.get_recommendation_state()
+        dirty = dict(db.get_dirty_users())
+        if full or state is None or state[1] != key or state[2] != self.depth:
+            version = (state[0] if state else 0) + 1
+            # Dirty users without a users row (e.g. imported ratings) are included too
+            users = sorted({row[0] for row in db.iter_users()} | set(dirty))
+            completed = (version, key, self.depth)
         else:
-            focus_techniques = focus_techniques[:2]
-        
-        weekly_plan.append(f"{day} ({intensity} - {focus} Focus):")
-        weekly_plan.append(f"  1. {focus_techniques[0]}")
-        weekly_plan.append(f"  2. {focus_techniques[1]}")
-        weekly_plan.append(f"  3. Conditioning: {random.choice(['HIIT', 'Strength Training', 'Cardio'])}")
-        
-        # Add detailed explanations for each focus area
-        if focus == "Upper Body":
-            weekly_plan.append("  Upper Body Focus Explanation:")
-            weekly_plan.append("   - Emphasizes techniques that primarily use arms, shoulders, and chest")
-            weekly_plan.append("   - Includes submissions like armbars, kimuras, and chokes")
-            weekly_plan.append("   - Drill grip fighting and upper body control positions")
-        elif focus == "Lower Body":
-            weekly_plan.append("  Lower Body Focus Explanation:")
-            weekly_plan.append("   - Concentrates on techniques involving legs and hips")
-            weekly_plan.append("   - Includes leg locks, sweeps, and guard retention drills")
-            weekly_plan.append("   - Practice hip mobility and leg dexterity exercises")
-        elif focus == "Submissions":
-            weekly_plan.append("  Submissions Focus Explanation:")
-            weekly_plan.append("   - Focuses on finishing techniques from various positions")
-            weekly_plan.append("   - Drill submission setups and transitions between submissions")
-            weekly_plan.append("   - Practice both gi and no-gi specific submissions")
-        elif focus == "Guard":
-            weekly_plan.append("  Guard Focus Explanation:")
-            weekly_plan.append("   - Emphasizes guard retention, recovery, and attacks")
-            weekly_plan.append("   - Practice different guard types (closed, open, half)")
-            weekly_plan.append("   - Drill sweeps and submissions from guard positions")
-        elif focus == "Takedowns":
-            weekly_plan.append("  Takedowns Focus Explanation:")
-            weekly_plan.append("   - Concentrates on techniques to bring the fight to the ground")
-            weekly_plan.append("   - Practice both gi and no-gi takedowns")
-            weekly_plan.append("   - Drill takedown defense and sprawls")
-        
-        # Add focus on weaknesses/goals
-        if weaknesses and random.random() < 0.5:  # 50% chance to add a weakness focus
-            weakness_focus = random.choice(weaknesses)
-            weekly_plan.append(f"  4. Weakness Focus: {weakness_focus}")
-            weekly_plan.append(f"   - Dedicate extra time to drilling and situational sparring")
-            weekly_plan.append(f"   - Focus on specific techniques or positions related to this weakness")
-    
-    weekly_plan.append("Wednesday: Active Recovery (Light drilling, Yoga, or Mobility work)")
-    weekly_plan.append("Sunday: Rest")
-    
-    return weekly_plan
+            version = state[0]
+            users = sorted(dirty)
+            completed = None
+        db_ids = recommender.catalog_ids.db_ids
+        for start in range(0, max(len(users), 1), self.block_size):
+            block = users[start:start + self.block_size]
+            ranked = recommender.rank_block(model, neighbors, block, self.depth) if block else {}
+            rows = [(user_id, rank, int(db_ids[pos]), float(score), version)
+                    for user_id in block for rank, (pos, score) in enumerate(ranked[user_id])]
+            last = start + self.block_size >= len(users)
+            db.write_recommendations(block, rows, [(user_id, dirty[user_id]) for user_id in block if user_id in dirty],
+                                     completed if last else None)
+        metrics.set_gauge('materialized_model_version', version)
+        return len(users)
+
+# Plans come from one engine built over the technique catalog; the functions below keep
+# the original text/list return types, and seed= makes a plan reproducible (and memoized)
+plan_engine = PlanEngine(technique_catalog)
+
+
+def create_sc_plan(method, skill, level, seed=None):
+    return plan_engine.build_sc_plan(method, skill, level, seed=seed).to_text()
+
+
+def dynamic_effort_method(level, rng=random):
+    return dynamic_effort_body(level, rng).to_text()
+
+
+def conjugate_method(level, rng=random):
+    return conjugate_body(level, rng).to_text()
+
+
+def linear_periodization(level, rng=random):
+    return linear_body(level, rng).to_text()
+
+
+def undulating_periodization(level, rng=random):
+    return undulating_body(level, rng).to_text()
+
+
+def block_periodization(level, rng=random):
+    return block_body(level, rng).to_text()
+
+
+def create_periodized_plan(skill, level, weaknesses, seed=None):
+    return plan_engine.build_periodized_plan(skill, level, weaknesses, seed=seed).lines()
+
+
+def create_weekly_plan(skill, level, recommended_techniques, weaknesses, seed=None):
+    return plan_engine.build_weekly_plan(skill, level, recommended_techniques, weaknesses, seed=seed).lines()
+
+
+def __getattr__(name):
+    # Keeps `from recommender_bjj_func import BJJRecommenderGUI` working without making
+    # every importer of the core pay for PyQt5
+    if name == 'BJJRecommenderGUI':
+        from recommender_bjj_gui import BJJRecommenderGUI
+        return BJJRecommenderGUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
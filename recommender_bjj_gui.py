@@ -0,0 +1,290 @@
+import sys
+import time
+
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QMessageBox, QCompleter
+from PyQt5.QtCore import Qt, pyqtSignal
+
+from recommender_bjj_auth import AuthService
+from recommender_bjj_func import (Database, MatrixFactorizationRecommender, RatingWriteQueue, S_C_METHODS,
+                                  DEFAULT_CHECKPOINT_DIR, create_periodized_plan, create_weekly_plan, create_sc_plan)
+
+
+class BJJRecommenderGUI(QWidget):
+    # Emitted from the trainer thread, delivered on the GUI thread
+    model_swapped = pyqtSignal(int, float)
+    # (action, future) from the auth worker pool, delivered on the GUI thread
+    auth_finished = pyqtSignal(str, object)
+    # (technique, future) from the rating writer thread, delivered on the GUI thread
+    rating_finished = pyqtSignal(str, object)
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self.auth = AuthService(db)
+        self.session = None
+        self.recommender = MatrixFactorizationRecommender(db, background=True,
+                                                          checkpoint_dir=DEFAULT_CHECKPOINT_DIR)
+        self.ratings = RatingWriteQueue(db, on_batch=[self.recommender.fold_in_many])
+        self.initUI()
+        self.model_swapped.connect(self.show_model_status)
+        self.auth_finished.connect(self.finish_auth)
+        self.rating_finished.connect(self.finish_rating)
+        self.recommender.add_listener(self.model_swapped.emit)
+        if self.recommender.last_trained is not None:
+            self.show_model_status(self.recommender.model_version, self.recommender.last_trained)
+
+
+    def initUI(self):
+        main_layout = QVBoxLayout()
+
+        # Login/Register section
+        login_layout = QHBoxLayout()
+        self.username_input = QLineEdit()
+        self.password_input = QLineEdit()
+        self.password_input.setEchoMode(QLineEdit.Password)
+        self.login_button = login_button = QPushButton('Login')
+        self.register_button = register_button = QPushButton('Register')
+        login_button.clicked.connect(self.login)
+        register_button.clicked.connect(self.register)
+        login_layout.addWidget(QLabel('Username:'))
+        login_layout.addWidget(self.username_input)
+        login_layout.addWidget(QLabel('Password:'))
+        login_layout.addWidget(self.password_input)
+        login_layout.addWidget(login_button)
+        login_layout.addWidget(register_button)
+        main_layout.addLayout(login_layout)
+
+        # Skill input
+        skill_layout = QHBoxLayout()
+        skill_layout.addWidget(QLabel('Primary BJJ Skill:'))
+        self.skill_input = QLineEdit()
+        skill_layout.addWidget(self.skill_input)
+        main_layout.addLayout(skill_layout)
+
+        # Level input
+        level_layout = QHBoxLayout()
+        level_layout.addWidget(QLabel('BJJ Level:'))
+        self.level_input = QComboBox()
+        self.level_input.addItems(['Beginner', 'Intermediate', 'Advanced'])
+        level_layout.addWidget(self.level_input)
+        main_layout.addLayout(level_layout)
+
+        # Techniques input
+        techniques_layout = QHBoxLayout()
+        techniques_layout.addWidget(QLabel('Preferred Techniques (comma-separated):'))
+        self.techniques_input = QLineEdit()
+        techniques_layout.addWidget(self.techniques_input)
+        main_layout.addLayout(techniques_layout)
+
+        # Weaknesses/Goals input
+        weaknesses_layout = QHBoxLayout()
+        weaknesses_layout.addWidget(QLabel('Weaknesses/Goals (comma-separated):'))
+        self.weaknesses_input = QLineEdit()
+        weaknesses_layout.addWidget(self.weaknesses_input)
+        main_layout.addLayout(weaknesses_layout)
+
+        # Rate technique section
+        rate_layout = QHBoxLayout()
+        self.technique_to_rate = QLineEdit()
+        completer = QCompleter(self.recommender.catalog.names)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchContains)
+        self.technique_to_rate.setCompleter(completer)
+        self.rating_input = QComboBox()
+        self.rating_input.addItems(['1', '2', '3', '4', '5'])
+        rate_button = QPushButton('Rate Technique')
+        rate_button.clicked.connect(self.rate_technique)
+        rate_layout.addWidget(QLabel('Technique to rate:'))
+        rate_layout.addWidget(self.technique_to_rate)
+        rate_layout.addWidget(QLabel('Rating:'))
+        rate_layout.addWidget(self.rating_input)
+        rate_layout.addWidget(rate_button)
+        main_layout.addLayout(rate_layout)
+
+        # Submit button
+        self.submit_button = QPushButton('Get Recommendations')
+        self.submit_button.clicked.connect(self.get_recommendations)
+        main_layout.addWidget(self.submit_button)
+
+        # Model status indicator
+        self.model_status = QLabel('Model: training...')
+        main_layout.addWidget(self.model_status)
+
+        # Results display
+        self.results_display = QTextEdit()
+        self.results_display.setReadOnly(True)
+        main_layout.addWidget(self.results_display)
+
+        self.setLayout(main_layout)
+        self.setWindowTitle('BJJ Technique Recommender')
+        self.show()
+
+                # Strength & Conditioning section
+        sc_layout = QHBoxLayout()
+        sc_layout.addWidget(QLabel('Strength & Conditioning Method:'))
+        self.sc_method_input = QComboBox()
+        self.sc_method_input.addItems(list(S_C_METHODS.keys()))
+        sc_layout.addWidget(self.sc_method_input)
+        main_layout.addLayout(sc_layout)
+
+        # S&C Recommendation button
+        self.sc_recommend_button = QPushButton('Get S&C Recommendations')
+        self.sc_recommend_button.clicked.connect(self.get_sc_recommendations)
+        main_layout.addWidget(self.sc_recommend_button)
+
+
+
+    def show_model_status(self, version, trained):
+        if self.recommender.model is None:
+            status = 'no ratings yet'
+        else:
+            status = f"last trained {time.strftime('%H:%M:%S', time.localtime(trained))}"
+        self.model_status.setText(f'Model: v{version}, {status}')
+
+    def closeEvent(self, event):
+        self.ratings.close()
+        self.recommender.close()
+        self.auth.close()
+        super().closeEvent(event)
+
+    def current_user(self):
+        # The logged-in user's id, from the in-memory session (no password re-check)
+        return self.auth.session_user(self.session) if self.session else None
+
+    def set_auth_busy(self, busy):
+        self.login_button.setEnabled(not busy)
+        self.register_button.setEnabled(not busy)
+
+    def login(self):
+        username = self.username_input.text()
+        password = self.password_input.text()
+        self.set_auth_busy(True)
+        self.auth.login(username, password, callback=lambda future: self.auth_finished.emit('login', future))
+
+    def register(self):
+        username = self.username_input.text()
+        password = self.password_input.text()
+        skill = self.skill_input.text()
+        level = self.level_input.currentText().lower()
+        self.set_auth_busy(True)
+        self.auth.register(username, password, skill, level,
+                           callback=lambda future: self.auth_finished.emit('register', future))
+
+    def finish_auth(self, action, future):
+        self.set_auth_busy(False)
+        try:
+            result = future.result()
+        except Exception as e:
+            QMessageBox.warning(self, 'Error', f'{action.capitalize()} failed: {e}')
+            return
+        if action == 'login':
+            if result:
+                if self.session:
+                    self.auth.logout(self.session)
+                _, self.session = result
+                QMessageBox.information(self, 'Success', 'Logged in successfully!')
+            else:
+                QMessageBox.warning(self, 'Error', 'Invalid username or password')
+        elif result:
+            QMessageBox.information(self, 'Success', 'Registered successfully! You can now log in.')
+        else:
+            QMessageBox.warning(self, 'Error', 'Username already exists')
+
+    def rate_technique(self):
+        user_id = self.current_user()
+        if not user_id:
+            QMessageBox.warning(self, 'Error', 'Please log in first')
+            return
+        query = self.technique_to_rate.text()
+        # Accept any spelling that unambiguously names a technique ("kimura", "armbra")
+        technique = self.recommender.catalog.resolve_one(query)
+        if technique is None:
+            matches = self.recommender.catalog.resolve(query)
+            if matches:
+                QMessageBox.warning(self, 'Error', 'Which technique did you mean?\n' +
+                                    '\n'.join(f'- {self.recommender.catalog.names[i]}' for i, _ in matches))
+            else:
+                QMessageBox.warning(self, 'Error', 'Invalid technique name')
+            return
+        self.technique_to_rate.setText(technique)
+        rating = int(self.rating_input.currentText())
+        self.ratings.submit(user_id, technique, rating).add_done_callback(
+            lambda future: self.rating_finished.emit(technique, future))
+
+    def finish_rating(self, technique, future):
+        try:
+            written = future.result()
+        except Exception as e:
+            QMessageBox.warning(self, 'Error', f'Saving the rating failed: {e}')
+            return
+        if written:
+            message = 'Rating added successfully!'
+            similar = self.recommender.similar_techniques(technique)
+            if similar:
+                message += '\n\nYou may also like:\n' + '\n'.join(f'- {name}' for name in similar)
+            QMessageBox.information(self, 'Success', message)
+        else:
+            QMessageBox.warning(self, 'Error', 'Invalid technique name')
+
+    def get_sc_recommendations(self):
+        user_id = self.current_user()
+        if not user_id:
+            QMessageBox.warning(self, 'Error', 'Please log in first')
+            return
+        
+        selected_method = self.sc_method_input.currentText()
+        skill, level = self.db.get_user_info(user_id)
+        
+        sc_plan = create_sc_plan(selected_method, skill, level)
+        
+        results = f"Strength & Conditioning Plan ({selected_method}):\n\n"
+        results += sc_plan
+        
+        self.results_display.setText(results)
+
+
+    def get_recommendations(self):
+        user_id = self.current_user()
+        if not user_id:
+            QMessageBox.warning(self, 'Error', 'Please log in first')
+            return
+        
+        skill, level = self.db.get_user_info(user_id)
+        weaknesses = [w.strip() for w in self.weaknesses_input.text().split(',')]
+
+        recommended_techniques = self.recommender.recommend_techniques(user_id)
+        periodized_plan = create_periodized_plan(skill, level, weaknesses)
+        # The weekly plan picks the best per focus area from the full ranking
+        ranking = self.recommender.recommend_techniques(user_id, k=len(self.recommender.catalog))
+        weekly_plan = create_weekly_plan(skill, level, ranking, weaknesses)
+        
+        selected_method = self.sc_method_input.currentText()
+        sc_plan = create_sc_plan(selected_method, skill, level)
+
+        results = f"Recommended techniques:\n"
+        for technique in recommended_techniques:
+            results += f"- {technique}\n"
+        
+        results += "\nPeriodized Training Plan:\n"
+        for week in periodized_plan:
+            results += f"{week}\n"
+        
+        results += "\nWeekly Training Plan:\n"
+        for session in weekly_plan:
+            results += f"{session}\n"
+        
+        results += f"\nStrength & Conditioning Plan ({selected_method}):\n"
+        results += sc_plan
+
+        self.results_display.setText(results)
+
+
+def main():
+    db = Database(performance=True)
+    app = QApplication(sys.argv)
+    ex = BJJRecommenderGUI(db)
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from recommender_bjj_func import Database, technique_catalog
+
+
+def read_csv_ratings(f):
+    # Expects a header with user_id, technique (or technique_name) and rating columns
+    for row in csv.DictReader(f):
+        yield row.get('user_id'), row.get('technique', row.get('technique_name')), row.get('rating')
+
+
+def read_jsonl_ratings(f):
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield record.get('user_id'), record.get('technique', record.get('technique_name')), record.get('rating')
+        except (ValueError, AttributeError):
+            # A one-field row, so add_ratings_bulk can't unpack it and reports it as malformed
+            yield (line.rstrip('\n'),)
+
+
+def import_ratings(db, path, fmt=None, chunk_size=5000, on_reject=None, catalog=technique_catalog):
+    # Streams the file through Database.add_ratings_bulk; never holds more than a chunk.
+    # The catalog is synced first so names resolve on a fresh database too.
+    db.sync_catalog(catalog)
+    if fmt is None:
+        fmt = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.json') else 'csv'
+    reader = read_jsonl_ratings if fmt == 'jsonl' else read_csv_ratings
+    with open(path, newline='') as f:
+        return db.add_ratings_bulk(reader(f), chunk_size=chunk_size, on_reject=on_reject)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import historical ratings from CSV or JSONL.')
+    parser.add_argument('path')
+    parser.add_argument('--db', default='bjj_recommender.db')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: guessed from the extension')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per transaction')
+    parser.add_argument('--rejects', help='write rejected rows (index, reason, row) to this CSV file')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, performance=True)
+    rejects_file = open(args.rejects, 'w', newline='') if args.rejects else None
+    rejects = csv.writer(rejects_file) if rejects_file else None
+    rejected = 0
+
+    def on_reject(index, row, reason):
+        nonlocal rejected
+        rejected += 1
+        if rejects:
+            rejects.writerow([index, reason, row])
+
+    start = time.perf_counter()
+    try:
+        inserted, _ = import_ratings(db, args.path, args.format, args.chunk_size, on_reject)
+    finally:
+        db.close()
+        if rejects_file:
+            rejects_file.close()
+    elapsed = time.perf_counter() - start
+    print(f'Imported {inserted} ratings, rejected {rejected}, in {elapsed:.2f}s '
+          f'({inserted / elapsed if elapsed else 0:.0f} rows/sec)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
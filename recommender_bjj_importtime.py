@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Cumulative import time budget (ms) for modules that batch workers and services import.
+# None of them may pull in the heavy libraries at import time; those load on first use.
+BUDGETS_MS = {
+    'recommender_bjj_func': 150,
+    'recommender_bjj_model': 100,
+    'recommender_bjj_plans': 50,
+    'recommender_bjj_catalog': 30,
+    'recommender_bjj_auth': 100,
+    'recommender_bjj_batch': 200,
+    'recommender_bjj_import': 150,
+    'recommender_bjj_service': 200,
+}
+FORBIDDEN = ('PyQt5', 'numpy', 'pandas', 'surprise', 'sklearn', 'werkzeug')
+
+
+def import_profile(module):
+    # (cumulative ms, top-level modules loaded); raises ImportError with the child's last
+    # stderr line if the import fails. Runs from the repo directory so it works from anywhere.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise ImportError(lines[-1] if lines else f'exit status {result.returncode}')
+    cumulative_ms = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative_us, name = line.split('|')
+        if not cumulative_us.strip().isdigit():
+            continue  # header row
+        loaded.add(name.strip().split('.')[0])
+        if name.strip() == module:
+            cumulative_ms = int(cumulative_us) / 1000
+    return cumulative_ms, loaded
+
+
+def measure(module, runs=5):
+    # Best of several `python -X importtime` runs, after a warm-up run that fills the
+    # bytecode cache
+    import_profile(module)
+    best = float('inf')
+    loaded = set()
+    for _ in range(runs):
+        elapsed, modules = import_profile(module)
+        best = min(best, elapsed)
+        loaded |= modules
+    return best, sorted(loaded.intersection(FORBIDDEN))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check module import times against the startup budget.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = []
+    for module, budget in BUDGETS_MS.items():
+        try:
+            elapsed, forbidden = measure(module, args.runs)
+        except ImportError as e:
+            # A module that doesn't import at all fails its budget
+            report.append({'module': module, 'import_ms': None, 'budget_ms': budget, 'heavy_imports': [],
+                           'error': str(e), 'ok': False})
+            continue
+        report.append({'module': module, 'import_ms': round(elapsed, 1), 'budget_ms': budget,
+                       'heavy_imports': forbidden, 'ok': elapsed <= budget and not forbidden})
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report:
+            if entry['import_ms'] is None:
+                print(f"{entry['module']:<26} IMPORT FAILED: {entry['error']}")
+                continue
+            status = 'ok' if entry['ok'] else 'OVER BUDGET'
+            heavy = f" (imports {', '.join(entry['heavy_imports'])})" if entry['heavy_imports'] else ''
+            print(f"{entry['module']:<26} {entry['import_ms']:>7.1f} ms / {entry['budget_ms']} ms  {status}{heavy}")
+    return 0 if all(entry['ok'] for entry in report) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
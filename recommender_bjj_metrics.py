@@ -0,0 +1,175 @@
+import atexit
+import bisect
+import functools
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts))}
+
+
+class Metrics:
+    # Call counts, latency histograms, rows read and gauges (e.g. model size) for the
+    # hot paths. Everything is a no-op apart from one attribute check while disabled.
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.rows = {}
+        self.gauges = {}
+        self._profiler = None
+        self._profiling_memory = False
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.rows.clear()
+            self.gauges.clear()
+
+    def observe(self, name, seconds, rows=None):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            if rows is not None:
+                self.rows[name] = self.rows.get(name, 0) + rows
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def timed(self, name, rows=None):
+        # Decorator; rows(result) -> number of rows the call read or wrote
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                result = fn(*args, **kwargs)
+                self.observe(name, time.perf_counter() - start, rows(result) if rows else None)
+                return result
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'calls': {name: h.to_dict() for name, h in self.histograms.items()},
+                'rows': dict(self.rows),
+                'gauges': dict(self.gauges),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = ['# HELP bjj_call_duration_seconds Latency of instrumented calls',
+                 '# TYPE bjj_call_duration_seconds histogram']
+        for name, histogram in sorted(snapshot['calls'].items()):
+            cumulative = 0
+            for bound, count in histogram['buckets'].items():
+                cumulative += count
+                lines.append(f'bjj_call_duration_seconds_bucket{{fn="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'bjj_call_duration_seconds_sum{{fn="{name}"}} {histogram["sum"]}')
+            lines.append(f'bjj_call_duration_seconds_count{{fn="{name}"}} {histogram["count"]}')
+        lines += ['# HELP bjj_rows_total Rows read or written by instrumented calls',
+                  '# TYPE bjj_rows_total counter']
+        lines += [f'bjj_rows_total{{fn="{name}"}} {value}' for name, value in sorted(snapshot['rows'].items())]
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines += [f'# TYPE bjj_{name} gauge', f'bjj_{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # Prometheus text format unless the path ends in .json; written atomically so a
+        # node_exporter textfile collector never sees a partial file
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def start_profiling(self, cpu=True, memory=False):
+        # cProfile only sees the calling thread; tracemalloc sees all of them
+        if cpu and self._profiler is None:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._profiling_memory = True
+
+    def stop_profiling(self, path=None, limit=25):
+        # Returns a text report; with path, also dumps the raw cProfile stats there
+        import pstats
+
+        report = io.StringIO()
+        if self._profiler is not None:
+            self._profiler.disable()
+            if path:
+                self._profiler.dump_stats(path)
+            pstats.Stats(self._profiler, stream=report).sort_stats('cumulative').print_stats(limit)
+            self._profiler = None
+        if self._profiling_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            report.write(f'\ntracemalloc: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n')
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:limit]:
+                report.write(f'{stat}\n')
+            tracemalloc.stop()
+            self._profiling_memory = False
+        return report.getvalue()
+
+
+metrics = Metrics()
+timed = metrics.timed
+timer = metrics.timer
+
+# BJJ_METRICS=path enables collection at startup and writes a snapshot to path (JSON if
+# it ends in .json, Prometheus text otherwise) at exit; {pid} is replaced per process.
+if os.environ.get('BJJ_METRICS'):
+    metrics.enable()
+    atexit.register(lambda: metrics.write(os.environ['BJJ_METRICS'].replace('{pid}', str(os.getpid()))))
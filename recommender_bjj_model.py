@@ -0,0 +1,754 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from recommender_bjj_lazy import LazyModule
+from recommender_bjj_metrics import timed, timer
+
+np = LazyModule('numpy')
+
+# Same hyperparameters the recommender has always trained Surprise's SVD with
+DEFAULT_SVD_PARAMS = {'n_factors': 20, 'n_epochs': 20, 'lr_all': 0.005, 'reg_all': 0.02}
+# Overrides per training backend. ALS converges in far fewer sweeps than SGD needs epochs,
+# and its regularization is scaled by each row's rating count (see train_als).
+BACKEND_PARAMS = {'als': {'n_epochs': 10, 'reg_all': 0.1}}
+# Fold-in options per backend: ALS models keep item factors fixed, as in an ALS user
+# half-step, instead of nudging the rated item with SGD steps
+FOLD_IN_PARAMS = {'als': {'item_steps': 0}}
+# Parameters that only affect training speed, not the model (left out of trained_with)
+RUNTIME_PARAMS = ('workers', 'block_ratings')
+RATING_SCALE = (1, 5)
+# Storage for CompactFactorModel's user factors
+COMPACT_DTYPES = ('float32', 'int8')
+
+
+def default_params(backend):
+    return dict(DEFAULT_SVD_PARAMS, **BACKEND_PARAMS.get(backend, {}))
+
+
+def training_config(backend, params):
+    # What a checkpoint must have been trained with to be reused (see load_checkpoint)
+    return {'backend': backend, 'params': {name: value for name, value in sorted(params.items())
+                                           if name not in RUNTIME_PARAMS}}
+
+
+def _append_row(buf, count, row):
+    # Amortized growth so adding a user or item doesn't copy the whole matrix each time
+    if count == len(buf):
+        grown = np.zeros((max(2 * len(buf), 8),) + buf.shape[1:], dtype=buf.dtype)
+        grown[:count] = buf[:count]
+        buf = grown
+    buf[count] = row
+    return buf
+
+
+def top_k(scores, k):
+    # Indices of the k best scores (per row for 2-D input), best first, via argpartition
+    # instead of a full sort. Masked entries should be -inf; callers drop them.
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class FactorModel:
+    def __init__(self, mu, pu, bu, qi, bi, user_ids, item_names, n_ratings=0, fingerprint=None,
+                 seed=None):
+        self.mu = float(mu)
+        self._pu = np.asarray(pu, dtype=np.float64)
+        self._bu = np.asarray(bu, dtype=np.float64)
+        self._qi = np.asarray(qi, dtype=np.float64)
+        self._bi = np.asarray(bi, dtype=np.float64)
+        self.user_ids = list(user_ids)
+        self.item_names = list(item_names)
+        self.user_index = {uid: row for row, uid in enumerate(self.user_ids)}
+        self.item_index = {name: row for row, name in enumerate(self.item_names)}
+        self.n_ratings = n_ratings
+        # Fingerprint of the ratings table the model was trained on (see save_checkpoint)
+        self.fingerprint = fingerprint
+        # training_config() of the run that trained it, if known
+        self.trained_with = None
+        # Items [0, n_catalog) are the catalog in catalog order (see align_items)
+        self.n_catalog = 0
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_surprise(cls, algo, trainset, n_ratings=0, item_names=None):
+        # item_names translates Surprise's raw item ids when they are dense indices
+        user_ids = [trainset.to_raw_uid(inner) for inner in range(trainset.n_users)]
+        raw_items = [trainset.to_raw_iid(inner) for inner in range(trainset.n_items)]
+        if item_names is not None:
+            raw_items = [item_names[item] for item in raw_items]
+        return cls(trainset.global_mean, algo.pu, algo.bu, algo.qi, algo.bi,
+                   user_ids, raw_items, n_ratings=n_ratings)
+
+    @property
+    def n_factors(self):
+        return self._pu.shape[1]
+
+    @property
+    def pu(self):
+        return self._pu[:len(self.user_ids)]
+
+    @property
+    def bu(self):
+        return self._bu[:len(self.user_ids)]
+
+    @property
+    def qi(self):
+        return self._qi[:len(self.item_names)]
+
+    @property
+    def bi(self):
+        return self._bi[:len(self.item_names)]
+
+    def align_items(self, names):
+        # Reorder item rows so the catalog comes first, in catalog order. Catalog items the
+        # model has never seen get zero factors/bias, which scores them exactly like
+        # SVD's unknown-item fallback (mu + bu).
+        names = list(names)
+        if self.n_catalog == len(names) and self.item_names[:len(names)] == names:
+            return
+        catalog = set(names)
+        order = names + [name for name in self.item_names if name not in catalog]
+        src = np.array([self.item_index.get(name, -1) for name in order], dtype=np.intp)
+        known = src >= 0
+        qi = np.zeros((len(order), self.n_factors), dtype=self._qi.dtype)
+        bi = np.zeros(len(order), dtype=self._bi.dtype)
+        qi[known] = self.qi[src[known]]
+        bi[known] = self.bi[src[known]]
+        self._qi, self._bi = qi, bi
+        self.item_names = order
+        self.item_index = {name: row for row, name in enumerate(order)}
+        self.n_catalog = len(names)
+
+    @timed('FactorModel.score_items')
+    def score_items(self, user_id):
+        # Raw (unclipped) scores for every catalog item with one matrix-vector product
+        n = self.n_catalog
+        u = self.user_index.get(user_id)
+        if u is None:
+            return self.mu + self._bi[:n]
+        return self.mu + self._bu[u] + self._bi[:n] + self._qi[:n] @ self._pu[u]
+
+    @timed('FactorModel.score_users', rows=len)
+    def score_users(self, user_ids):
+        # One row of catalog scores per user, as a single matrix-matrix product
+        n = self.n_catalog
+        rows = np.array([self.user_index.get(uid, -1) for uid in user_ids], dtype=np.intp)
+        known = rows >= 0
+        pu = np.zeros((len(rows), self.n_factors))
+        bu = np.zeros(len(rows))
+        pu[known] = self._pu[rows[known]]
+        bu[known] = self._bu[rows[known]]
+        return self.mu + bu[:, None] + self._bi[:n] + pu @ self._qi[:n].T
+
+    @property
+    def nbytes(self):
+        return self._pu.nbytes + self._bu.nbytes + self._qi.nbytes + self._bi.nbytes
+
+    def predict(self, user_id, item):
+        # Mirrors SVD.estimate: unknown users/items fall back to the available biases
+        est = self.mu
+        u = self.user_index.get(user_id)
+        i = self.item_index.get(item)
+        if u is not None:
+            est += self._bu[u]
+        if i is not None:
+            est += self._bi[i]
+        if u is not None and i is not None:
+            est += self._qi[i] @ self._pu[u]
+        return min(max(est, RATING_SCALE[0]), RATING_SCALE[1])
+
+    def predict_many(self, user_ids, items):
+        # predict() for parallel sequences of raw user ids and item names, vectorized
+        u = np.array([self.user_index.get(uid, -1) for uid in user_ids], dtype=np.intp)
+        i = np.array([self.item_index.get(item, -1) for item in items], dtype=np.intp)
+        known_u, known_i = u >= 0, i >= 0
+        est = np.full(len(u), self.mu)
+        est[known_u] += self._bu[u[known_u]]
+        est[known_i] += self._bi[i[known_i]]
+        both = known_u & known_i
+        est[both] += np.einsum('ij,ij->i', self._pu[u[both]], self._qi[i[both]])
+        return np.clip(est, *RATING_SCALE)
+
+    def _ensure_user(self, user_id):
+        u = self.user_index.get(user_id)
+        if u is None:
+            u = len(self.user_ids)
+            # Same N(0, 0.1) initialisation Surprise uses for fresh factors
+            self._pu = _append_row(self._pu, u, self.rng.normal(0, 0.1, self.n_factors))
+            self._bu = _append_row(self._bu, u, 0.0)
+            self.user_ids.append(user_id)
+            self.user_index[user_id] = u
+        return u
+
+    def _ensure_item(self, item):
+        i = self.item_index.get(item)
+        if i is None:
+            i = len(self.item_names)
+            self._qi = _append_row(self._qi, i, self.rng.normal(0, 0.1, self.n_factors))
+            self._bi = _append_row(self._bi, i, 0.0)
+            self.item_names.append(item)
+            self.item_index[item] = i
+        return i
+
+    def fold_in(self, user_id, user_ratings, item, rating, lr_all=0.005, reg_all=0.02, item_steps=3, **_):
+        # Re-fit only this user's factors/bias against the (fixed) item factors, using
+        # every rating the user has, then nudge the touched item with a few SGD steps.
+        # The user's [pu, bu] is the exact solution of
+        #   (F' F + reg_all * n * I) x = F' (r - mu - bi),  F = [qi, 1] of the n rated items
+        # (the system an ALS user half-step solves), which stays stable however many
+        # ratings the user has.
+        u = self._ensure_user(user_id)
+        i = self._ensure_item(item)
+        rows = np.array([self._ensure_item(name) for name, _ in user_ratings], dtype=np.intp)
+        r = np.array([value for _, value in user_ratings], dtype=np.float64)
+        pu, bu = self._get_user(u)
+        if len(rows):
+            q = self._qi[rows]
+            base = r - self.mu - self._bi[rows]
+            n = len(rows)
+            f = np.hstack([q, np.ones((n, 1))])
+            x = np.linalg.solve(f.T @ f + reg_all * n * np.eye(f.shape[1]), f.T @ base)
+            pu, bu = x[:-1], float(x[-1])
+
+        for _ in range(item_steps):
+            err = rating - (self.mu + bu + self._bi[i] + self._qi[i] @ pu)
+            self._bi[i] += lr_all * (err - reg_all * self._bi[i])
+            self._qi[i] += lr_all * (err * pu - reg_all * self._qi[i])
+        self._set_user(u, pu, bu)
+
+    def _get_user(self, u):
+        # A float64 working copy of one user's factors and bias
+        return self._pu[u].astype(np.float64), float(self._bu[u])
+
+    def _set_user(self, u, pu, bu):
+        self._pu[u] = pu
+        self._bu[u] = bu
+
+
+def _quantize(rows, dtype):
+    # (stored rows, per-row scales): float32 rows as they are (scales None), or int8 rows
+    # with a float32 scale each, max |value| / 127, so every row uses the full int8 range
+    rows = np.asarray(rows, dtype=np.float32)
+    if dtype == 'float32':
+        return rows, None
+    scale = np.abs(rows).max(axis=1) / 127 if rows.shape[1] else np.zeros(len(rows), dtype=np.float32)
+    scale[scale == 0] = 1
+    return np.rint(rows / scale[:, None]).astype(np.int8), scale.astype(np.float32)
+
+
+class CompactFactorModel(FactorModel):
+    # FactorModel for large memberships. User factors are stored as float32, or as int8
+    # with one float32 scale per row, and user ids as a sorted int64 array searched with
+    # np.searchsorted instead of a Python list plus dict. Biases and the (catalog-sized)
+    # item factors are float32. Scoring, prediction and fold-in work as in FactorModel;
+    # users are dequantized one block at a time.
+    #
+    # The user arrays live in one (ids, factors, scales, biases) tuple that readers take
+    # once. Adding a user builds new arrays and publishes a new tuple with one
+    # assignment, so scoring on other threads never pairs ids with rows of another size.
+    def __init__(self, mu, pu, bu, qi, bi, user_ids, item_names, dtype='int8', n_ratings=0, fingerprint=None,
+                 seed=None):
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f'unknown compact dtype: {dtype}')
+        self.dtype = dtype
+        self.mu = float(mu)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        order = np.argsort(user_ids, kind='stable')
+        # Quantized a block at a time, so converting a large (mapped) float64 model never
+        # holds a second full-precision copy
+        pu = np.asarray(pu)
+        factors = np.empty(pu.shape, dtype=np.float32 if dtype == 'float32' else np.int8)
+        scales = None if dtype == 'float32' else np.empty(len(pu), dtype=np.float32)
+        for start in range(0, len(order), 65536):
+            rows = order[start:start + 65536]
+            block, scale = _quantize(pu[rows], dtype)
+            factors[start:start + len(rows)] = block
+            if scale is not None:
+                scales[start:start + len(rows)] = scale
+        self._users = (user_ids[order], factors, scales, np.asarray(bu, dtype=np.float32)[order])
+        self._qi = np.array(qi, dtype=np.float32)
+        self._bi = np.array(bi, dtype=np.float32)
+        self.item_names = list(item_names)
+        self.item_index = {name: row for row, name in enumerate(self.item_names)}
+        self.n_ratings = n_ratings
+        self.fingerprint = fingerprint
+        self.trained_with = None
+        self.n_catalog = 0
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_model(cls, model, dtype='int8'):
+        compact = cls(model.mu, model.pu, model.bu, model.qi, model.bi, model.user_ids, model.item_names, dtype,
+                      n_ratings=model.n_ratings, fingerprint=model.fingerprint)
+        compact.n_catalog = model.n_catalog
+        compact.trained_with = model.trained_with
+        return compact
+
+    @property
+    def n_factors(self):
+        return self._qi.shape[1]
+
+    @property
+    def user_ids(self):
+        return self._users[0]
+
+    @property
+    def pu(self):
+        users = self._users
+        return self._user_factors(users, np.arange(len(users[0])))
+
+    @property
+    def bu(self):
+        return self._users[3]
+
+    @property
+    def nbytes(self):
+        return (sum(array.nbytes for array in self._users if array is not None) + self._qi.nbytes +
+                self._bi.nbytes)
+
+    @staticmethod
+    def _rows(users, user_ids):
+        # Row of each user id in a users tuple, -1 for unknown users, by binary search
+        ids = np.asarray(user_ids, dtype=np.int64)
+        known_ids = users[0]
+        if not len(known_ids):
+            return np.full(len(ids), -1, dtype=np.intp)
+        rows = np.minimum(np.searchsorted(known_ids, ids), len(known_ids) - 1)
+        return np.where(known_ids[rows] == ids, rows, -1)
+
+    @staticmethod
+    def _user_factors(users, rows):
+        _, factors, scales, _ = users
+        dequantized = factors[rows].astype(np.float32)
+        if scales is not None:
+            dequantized *= scales[rows, None]
+        return dequantized
+
+    @timed('CompactFactorModel.score_items')
+    def score_items(self, user_id):
+        n = self.n_catalog
+        users = self._users
+        u = self._rows(users, [user_id])[0]
+        if u < 0:
+            return self.mu + self._bi[:n]
+        return self.mu + users[3][u] + self._bi[:n] + self._qi[:n] @ self._user_factors(users, u)
+
+    @timed('CompactFactorModel.score_users', rows=len)
+    def score_users(self, user_ids):
+        n = self.n_catalog
+        users = self._users
+        rows = self._rows(users, user_ids)
+        known = rows >= 0
+        pu = np.zeros((len(rows), self.n_factors), dtype=np.float32)
+        bu = np.zeros(len(rows), dtype=np.float32)
+        pu[known] = self._user_factors(users, rows[known])
+        bu[known] = users[3][rows[known]]
+        return self.mu + bu[:, None] + self._bi[:n] + pu @ self._qi[:n].T
+
+    def predict(self, user_id, item):
+        return float(self.predict_many([user_id], [item])[0])
+
+    def predict_many(self, user_ids, items):
+        users = self._users
+        u = self._rows(users, user_ids)
+        i = np.array([self.item_index.get(item, -1) for item in items], dtype=np.intp)
+        known_u, known_i = u >= 0, i >= 0
+        est = np.full(len(u), self.mu)
+        est[known_u] += users[3][u[known_u]]
+        est[known_i] += self._bi[i[known_i]]
+        both = known_u & known_i
+        est[both] += np.einsum('ij,ij->i', self._user_factors(users, u[both]), self._qi[i[both]])
+        return np.clip(est, *RATING_SCALE)
+
+    def _ensure_user(self, user_id):
+        # New users are inserted at their sorted position: one copy of the user arrays,
+        # published as a new tuple (the next retrain starts from a fresh model anyway)
+        user_ids, factors, scales, biases = users = self._users
+        u = self._rows(users, [user_id])[0]
+        if u < 0:
+            u = int(np.searchsorted(user_ids, user_id))
+            row, scale = _quantize(self.rng.normal(0, 0.1, (1, self.n_factors)), self.dtype)
+            self._users = (np.insert(user_ids, u, user_id), np.insert(factors, u, row[0], axis=0),
+                           None if scales is None else np.insert(scales, u, scale[0]), np.insert(biases, u, 0.0))
+        return int(u)
+
+    def _get_user(self, u):
+        users = self._users
+        return self._user_factors(users, u).astype(np.float64), float(users[3][u])
+
+    def _set_user(self, u, pu, bu):
+        # Rows are updated in place; fold-ins run one at a time under the recommender's lock
+        _, factors, scales, biases = self._users
+        row, scale = _quantize(pu[None, :], self.dtype)
+        factors[u] = row[0]
+        if scales is not None:
+            scales[u] = scale[0]
+        biases[u] = bu
+
+
+class ItemNeighborIndex:
+    # The n most similar catalog items for every catalog item, by cosine similarity of the
+    # item factors, as compact (n_items, n) int32 positions and float32 similarities.
+    # Positions are catalog positions (the model is aligned, see align_items); -1 pads
+    # rows when fewer than n items have factors.
+    def __init__(self, neighbors, similarities):
+        self.neighbors = neighbors
+        self.similarities = similarities
+
+    @classmethod
+    @timed('ItemNeighborIndex.build')
+    def build(cls, model, n_neighbors=20, block_size=1024):
+        unit = cls._unit_factors(model)
+        n = len(unit)
+        n_neighbors = min(n_neighbors, max(n - 1, 0))
+        neighbors = np.full((n, n_neighbors), -1, dtype=np.int32)
+        similarities = np.zeros((n, n_neighbors), dtype=np.float32)
+        index = cls(neighbors, similarities)
+        for start in range(0, n, block_size):
+            index._fill(unit, np.arange(start, min(start + block_size, n)))
+        return index
+
+    @staticmethod
+    def _unit_factors(model):
+        qi = model.qi[:model.n_catalog]
+        norms = np.linalg.norm(qi, axis=1)
+        # Items without factors (never rated) have no direction; leave them unit-free so
+        # they never show up as anyone's neighbor
+        return np.divide(qi, norms[:, None], out=np.zeros_like(qi), where=norms[:, None] > 0)
+
+    def _fill(self, unit, rows):
+        n_neighbors = self.neighbors.shape[1]
+        if not n_neighbors:
+            return
+        sims = unit[rows] @ unit.T
+        sims[np.arange(len(rows)), rows] = -np.inf
+        sims[:, ~unit.any(axis=1)] = -np.inf
+        best = top_k(sims, n_neighbors)
+        best_sims = np.take_along_axis(sims, best, axis=1)
+        valid = best_sims != -np.inf
+        self.neighbors[rows] = np.where(valid, best, -1)
+        self.similarities[rows] = np.where(valid, best_sims, 0)
+
+    def update(self, model, positions):
+        # Refresh the rows of items whose factors just changed (fold-in). Other rows keep
+        # their lists until the next full build at model swap.
+        positions = np.asarray([p for p in positions if 0 <= p < len(self.neighbors)], dtype=np.intp)
+        if len(positions):
+            self._fill(self._unit_factors(model), positions)
+
+    def similar(self, position, k):
+        # [(position, similarity)] best first, in a single row lookup
+        row = self.neighbors[position, :k]
+        keep = row >= 0
+        return list(zip(row[keep].tolist(), self.similarities[position, :k][keep].tolist()))
+
+    def similar_to_any(self, positions, k, exclude=None):
+        # Best neighbors of any of positions, ranked by their highest similarity to one of
+        # them; exclude is a boolean mask over catalog positions
+        positions = np.asarray(positions, dtype=np.intp)
+        candidates = self.neighbors[positions].ravel()
+        sims = self.similarities[positions].ravel()
+        keep = candidates >= 0
+        if exclude is not None:
+            keep &= ~exclude[np.maximum(candidates, 0)]
+        candidates, sims = candidates[keep], sims[keep]
+        order = np.argsort(-sims, kind='stable')
+        _, first = np.unique(candidates[order], return_index=True)
+        return candidates[order][np.sort(first)][:k].tolist()
+
+    @property
+    def nbytes(self):
+        return self.neighbors.nbytes + self.similarities.nbytes
+
+
+class RatingsData:
+    # Ratings as three parallel compact arrays of dense indices, plus the id maps back
+    # to raw user ids and technique names
+    def __init__(self, users, items, ratings, user_ids, item_names):
+        self.users = users
+        self.items = items
+        self.ratings = ratings
+        self.user_ids = user_ids
+        self.item_names = item_names
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def nbytes(self):
+        return self.users.nbytes + self.items.nbytes + self.ratings.nbytes + self.user_ids.nbytes
+
+    def subset(self, index):
+        # The selected ratings, keeping the same dense user/item numbering
+        return RatingsData(self.users[index], self.items[index], self.ratings[index], self.user_ids,
+                           self.item_names)
+
+
+class _Interner:
+    def __init__(self):
+        self.index = {}
+
+    def intern(self, raw):
+        # Only the distinct values of a chunk go through the dict
+        uniq, inverse = np.unique(raw, return_inverse=True)
+        dense = np.array([self.index.setdefault(value, len(self.index)) for value in uniq.tolist()],
+                         dtype=np.int32)
+        return dense[inverse]
+
+    def raw_ids(self):
+        return list(self.index)
+
+
+@timed('load_ratings', rows=len)
+def load_ratings(db, chunk_size=65536, ordered=False):
+    # Streams the ratings cursor chunk by chunk straight into preallocated arrays, without
+    # ever building a list of every row or repeating technique names per rating. ordered
+    # keeps write order (rowid), e.g. for time-split evaluation.
+    names = db.get_technique_names()
+    capacity = max(db.count_ratings(), 1)
+    users = np.empty(capacity, dtype=np.int32)
+    items = np.empty(capacity, dtype=np.int32)
+    ratings = np.empty(capacity, dtype=np.float32)
+    user_interner, item_interner = _Interner(), _Interner()
+    n = 0
+    for chunk in db.iter_rating_chunks(chunk_size, ordered):
+        block = np.array(chunk, dtype=np.int64)
+        # Same filter as the techniques join: skip ratings of techniques that don't exist
+        block = block[np.isin(block[:, 1], list(names))]
+        if n + len(block) > capacity:
+            capacity = max(2 * capacity, n + len(block))
+            users, items, ratings = (np.resize(a, capacity) for a in (users, items, ratings))
+        users[n:n + len(block)] = user_interner.intern(block[:, 0])
+        items[n:n + len(block)] = item_interner.intern(block[:, 1])
+        ratings[n:n + len(block)] = block[:, 2]
+        n += len(block)
+    item_names = [names[technique_id] for technique_id in item_interner.raw_ids()]
+    return RatingsData(users[:n].copy(), items[:n].copy(), ratings[:n].copy(),
+                       np.array(user_interner.raw_ids(), dtype=np.int64), item_names)
+
+
+@timed('train_sgd')
+def train_sgd(data, n_factors=20, n_epochs=20, lr_all=0.005, reg_all=0.02, batch_size=256,
+              random_state=None, **_):
+    # Biased SVD fitted by SGD over shuffled mini-batches. Per-rating gradients within a
+    # batch are summed (np.add.at), not averaged, so each epoch applies the same total
+    # update magnitude as Surprise's one-rating-at-a-time loop.
+    rng = np.random.default_rng(random_state)
+    n_users, n_items = len(data.user_ids), len(data.item_names)
+    users = data.users.astype(np.intp)
+    items = data.items.astype(np.intp)
+    ratings = data.ratings.astype(np.float64)
+    mu = float(ratings.mean())
+    pu = rng.normal(0, 0.1, (n_users, n_factors))
+    qi = rng.normal(0, 0.1, (n_items, n_factors))
+    bu = np.zeros(n_users)
+    bi = np.zeros(n_items)
+    for _ in range(n_epochs):
+        order = rng.permutation(len(ratings))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            u, i = users[batch], items[batch]
+            p, q = pu[u], qi[i]
+            err = ratings[batch] - (mu + bu[u] + bi[i] + np.einsum('ij,ij->i', p, q))
+            np.add.at(bu, u, lr_all * (err - reg_all * bu[u]))
+            np.add.at(bi, i, lr_all * (err - reg_all * bi[i]))
+            np.add.at(pu, u, lr_all * (err[:, None] * q - reg_all * p))
+            np.add.at(qi, i, lr_all * (err[:, None] * p - reg_all * q))
+    return FactorModel(mu, pu, bu, qi, bi, data.user_ids.tolist(), data.item_names,
+                       n_ratings=len(data), seed=random_state)
+
+
+@timed('train_surprise')
+def train_surprise(data, n_factors=20, n_epochs=20, lr_all=0.005, reg_all=0.02, random_state=None, **_):
+    import pandas as pd
+    from surprise import SVD, Dataset, Reader
+
+    with timer('train_surprise.convert'):
+        # Items go in as dense indices rather than repeated name strings
+        df = pd.DataFrame({'user': data.user_ids[data.users], 'item': data.items, 'rating': data.ratings})
+        trainset = Dataset.load_from_df(df, Reader(rating_scale=RATING_SCALE)).build_full_trainset()
+        del df
+    algo = SVD(n_factors=n_factors, n_epochs=n_epochs, lr_all=lr_all, reg_all=reg_all,
+               random_state=random_state)
+    with timer('train_surprise.fit'):
+        algo.fit(trainset)
+    return FactorModel.from_surprise(algo, trainset, n_ratings=len(data), item_names=data.item_names)
+
+
+def _group_by(keys, n):
+    # CSR layout: order sorts the ratings by key, indptr[k]:indptr[k + 1] are key k's
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return order, indptr
+
+
+def _count_blocks(counts, block_ratings):
+    # Rows sorted by rating count, cut into blocks whose padded size (rows x longest row)
+    # stays within block_ratings; rows longer than that come back as single-row blocks
+    order = np.argsort(counts, kind='stable')
+    order = order[counts[order] > 0]
+    sorted_counts = counts[order]
+    blocks = []
+    start = 0
+    while start < len(order):
+        lo, hi = start + 1, len(order)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if (mid - start) * sorted_counts[mid - 1] <= block_ratings:
+                lo = mid
+            else:
+                hi = mid - 1
+        blocks.append(order[start:lo])
+        start = lo
+    return blocks
+
+
+def _als_half_step(indptr, cols, targets, features, reg, executor, block_ratings):
+    # Solves every row's regularized least-squares system
+    #   (F_r' F_r + reg * n_r * I) x_r = F_r' t_r
+    # where F_r are the feature rows of the items (or users) row r rated and t_r the
+    # residual targets. Rows with similar rating counts are padded to a common length so
+    # each block's F'F products are one batched matmul, then one batched solve. Rows
+    # without ratings keep x_r = 0.
+    n_rows, d = len(indptr) - 1, features.shape[1]
+    counts = np.diff(indptr)
+    solution = np.zeros((n_rows, d))
+    eye = np.eye(d)
+
+    def solve(rows):
+        row_counts = counts[rows]
+        offsets = np.arange(row_counts.max())
+        valid = offsets < row_counts[:, None]
+        take = np.where(valid, indptr[rows][:, None] + offsets, 0)
+        f = features[cols[take]] * valid[..., None]
+        t = np.where(valid, targets[take], 0)
+        ft = f.transpose(0, 2, 1)
+        a = ft @ f + reg * row_counts[:, None, None] * eye
+        b = ft @ t[..., None]
+        solution[rows] = np.linalg.solve(a, b)[..., 0]
+
+    list(executor.map(solve, _count_blocks(counts, block_ratings)))
+    return solution
+
+
+@timed('train_als')
+def train_als(data, n_factors=20, n_epochs=20, reg_all=0.02, random_state=None, workers=None,
+              block_ratings=65536, **_):
+    # Biased alternating least squares. With the items fixed, each user's [pu, bu] is an
+    # independent least-squares problem against [qi, 1] (and vice versa), so each
+    # half-step solves all of them in vectorized blocks spread over a thread pool; NumPy
+    # releases the GIL in the heavy parts. Regularization scales with the row's rating
+    # count (weighted-lambda ALS). n_epochs counts full user+item sweeps.
+    rng = np.random.default_rng(random_state)
+    n_users, n_items = len(data.user_ids), len(data.item_names)
+    users = data.users.astype(np.intp)
+    items = data.items.astype(np.intp)
+    ratings = data.ratings.astype(np.float64)
+    mu = float(ratings.mean())
+    by_user, user_ptr = _group_by(users, n_users)
+    by_item, item_ptr = _group_by(items, n_items)
+    pu = np.zeros((n_users, n_factors))
+    bu = np.zeros(n_users)
+    qi = rng.normal(0, 0.1, (n_items, n_factors))
+    bi = np.zeros(n_items)
+    ones_u, ones_i = np.ones((n_users, 1)), np.ones((n_items, 1))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for _ in range(n_epochs):
+            solution = _als_half_step(user_ptr, items[by_user], ratings[by_user] - mu - bi[items[by_user]],
+                                      np.hstack([qi, ones_i]), reg_all, executor, block_ratings)
+            pu, bu = solution[:, :n_factors], solution[:, n_factors]
+            solution = _als_half_step(item_ptr, users[by_item], ratings[by_item] - mu - bu[users[by_item]],
+                                      np.hstack([pu, ones_u]), reg_all, executor, block_ratings)
+            qi, bi = solution[:, :n_factors], solution[:, n_factors]
+    return FactorModel(mu, pu, bu, qi, bi, data.user_ids.tolist(), data.item_names,
+                       n_ratings=len(data), seed=random_state)
+
+
+TRAINERS = {'sgd': train_sgd, 'als': train_als, 'surprise': train_surprise}
+
+
+CHECKPOINT_ARRAYS = ('pu', 'bu', 'qi', 'bi')
+
+
+@timed('save_checkpoint')
+def save_checkpoint(model, directory, keep=2):
+    # Each checkpoint is a directory of .npy arrays plus meta.json, written under a temp
+    # name and renamed into place; LATEST is then atomically repointed at it.
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=directory)
+    for name in CHECKPOINT_ARRAYS:
+        np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(getattr(model, name)))
+    np.save(os.path.join(tmp, 'user_ids.npy'), np.array(model.user_ids, dtype=np.int64))
+    meta = {'mu': model.mu, 'item_names': model.item_names, 'n_catalog': model.n_catalog,
+            'n_ratings': model.n_ratings, 'fingerprint': model.fingerprint, 'trained_with': model.trained_with,
+            'created': time.time()}
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    # Time first so names sort oldest first; the temp directory's unique suffix keeps
+    # two writers in the same millisecond apart
+    name = f"model-{int(time.time() * 1000)}-{os.getpid()}-{os.path.basename(tmp)[len('.tmp-'):]}"
+    os.rename(tmp, os.path.join(directory, name))
+    # A temp file of its own, so concurrent writers can't clobber each other's pointer
+    fd, latest_tmp = tempfile.mkstemp(prefix='.LATEST-', dir=directory)
+    with os.fdopen(fd, 'w') as f:
+        f.write(name)
+    os.replace(latest_tmp, os.path.join(directory, 'LATEST'))
+
+    old = sorted(entry for entry in os.listdir(directory) if entry.startswith('model-') and entry != name)
+    with open(os.path.join(directory, 'LATEST')) as f:
+        # Another writer may have repointed LATEST since; never remove its target
+        latest = f.read().strip()
+    for entry in old[:max(len(old) - (keep - 1), 0)]:
+        if entry == latest:
+            continue
+        # Other processes may still have these mapped; that's fine on POSIX
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return os.path.join(directory, name)
+
+
+@timed('load_checkpoint')
+def load_checkpoint(directory, fingerprint=None, compact=None, trained_with=None):
+    # Memory-maps the latest checkpoint copy-on-write, so processes share the page cache
+    # until a fold-in writes to a page. Returns None if missing, unreadable or stale:
+    # trained on other ratings than fingerprint, or not with trained_with (see
+    # training_config).
+    # compact='float32'/'int8' returns a CompactFactorModel instead, built straight from
+    # the mapped arrays.
+    try:
+        with open(os.path.join(directory, 'LATEST')) as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if fingerprint is not None and meta['fingerprint'] != list(fingerprint):
+            return None
+        if trained_with is not None and meta.get('trained_with') != trained_with:
+            return None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='c')
+                  for name in CHECKPOINT_ARRAYS}
+        user_ids = np.load(os.path.join(path, 'user_ids.npy'))
+    except (OSError, ValueError, KeyError):
+        return None
+    if compact is not None:
+        model = CompactFactorModel(meta['mu'], arrays['pu'], arrays['bu'], arrays['qi'], arrays['bi'],
+                                   user_ids, meta['item_names'], compact, n_ratings=meta['n_ratings'],
+                                   fingerprint=meta['fingerprint'])
+    else:
+        model = FactorModel(meta['mu'], arrays['pu'], arrays['bu'], arrays['qi'], arrays['bi'],
+                            user_ids.tolist(), meta['item_names'], n_ratings=meta['n_ratings'],
+                            fingerprint=meta['fingerprint'])
+    model.n_catalog = meta['n_catalog']
+    model.trained_with = meta.get('trained_with')
+    return model
@@ -0,0 +1,434 @@
+# Plan engine: the static parts of every plan (exercise pools, level tables, focus
+# explanations, footer notes) are built once at import; a plan is a small structured
+# object that only turns into text or JSON when asked. Builders draw from an explicit
+# RNG, and plans built from a seed are memoized on (inputs, seed).
+import heapq
+import json
+import random
+from functools import lru_cache
+
+from recommender_bjj_catalog import Catalog
+
+OLYMPIC_LIFTS = ("Power Clean", "Hang Snatch", "Clean and Jerk")
+COMPOUND_EXERCISES = ("Squat", "Bench Press", "Deadlift", "Overhead Press")
+ACCESSORY_EXERCISES = ("Pull-ups", "Dips", "Barbell Row", "Lunges")
+MAX_EFFORT_EXERCISES = ("Box Squat", "Floor Press", "Rack Deadlift", "Good Morning")
+DYNAMIC_EFFORT_EXERCISES = ("Speed Squat", "Speed Bench", "Speed Deadlift")
+
+# Any level other than beginner/intermediate gets the advanced row
+DYNAMIC_EFFORT_LOADS = {  # (intensity, volume)
+    "beginner": ("40-50% 1RM", "3x3"),
+    "intermediate": ("50-60% 1RM", "4x3"),
+    "advanced": ("60-70% 1RM", "5x3"),
+}
+CONJUGATE_LOADS = {  # (max effort intensity, dynamic effort intensity)
+    "beginner": ("80-85% 1RM", "50-60% 1RM"),
+    "intermediate": ("85-90% 1RM", "60-70% 1RM"),
+    "advanced": ("90-95% 1RM", "70-80% 1RM"),
+}
+PHASE_LOADS = {  # (hypertrophy, strength, power)
+    "beginner": ("3x10-12 @ 65-70% 1RM", "4x6-8 @ 75-80% 1RM", "5x3-5 @ 80-85% 1RM"),
+    "intermediate": ("4x10-12 @ 70-75% 1RM", "5x6-8 @ 77-82% 1RM", "6x3-5 @ 82-87% 1RM"),
+    "advanced": ("5x10-12 @ 72-77% 1RM", "6x6-8 @ 80-85% 1RM", "7x3-5 @ 85-90% 1RM"),
+}
+
+SC_FOOTER = (
+    "Note: Adjust weights based on your current strength levels and recovery ability.",
+    "Always warm up properly and maintain good form throughout your workouts.",
+    "Consult with a certified strength and conditioning coach to tailor this plan to your specific needs.",
+)
+
+PERIODIZED_WEEK = (
+    "  Monday: High Intensity - Upper Body Focus",
+    "  Tuesday: Technical - Lower Body Focus",
+    "  Wednesday: Active Recovery",
+    "  Thursday: High Volume - Submissions Focus",
+    "  Friday: Technical - Guard and Takedowns",
+    "  Saturday: Competition Simulation",
+    "  Sunday: Rest",
+)
+PERIODIZED_WEEKS = {"beginner": 4, "intermediate": 6, "advanced": 8}
+
+# (day, intensity, focus area)
+WEEKLY_SCHEDULE = (
+    ("Monday", "High Intensity", "Upper Body"),
+    ("Tuesday", "Technical", "Lower Body"),
+    ("Thursday", "High Intensity", "Submissions"),
+    ("Friday", "Technical", "Guard"),
+    ("Saturday", "Technical", "Takedowns"),
+)
+CONDITIONING = ("HIIT", "Strength Training", "Cardio")
+TECHNIQUES_PER_DAY = 2
+FOCUS_EXPLANATIONS = {
+    "Upper Body": (
+        "Emphasizes techniques that primarily use arms, shoulders, and chest",
+        "Includes submissions like armbars, kimuras, and chokes",
+        "Drill grip fighting and upper body control positions",
+    ),
+    "Lower Body": (
+        "Concentrates on techniques involving legs and hips",
+        "Includes leg locks, sweeps, and guard retention drills",
+        "Practice hip mobility and leg dexterity exercises",
+    ),
+    "Submissions": (
+        "Focuses on finishing techniques from various positions",
+        "Drill submission setups and transitions between submissions",
+        "Practice both gi and no-gi specific submissions",
+    ),
+    "Guard": (
+        "Emphasizes guard retention, recovery, and attacks",
+        "Practice different guard types (closed, open, half)",
+        "Drill sweeps and submissions from guard positions",
+    ),
+    "Takedowns": (
+        "Concentrates on techniques to bring the fight to the ground",
+        "Practice both gi and no-gi takedowns",
+        "Drill takedown defense and sprawls",
+    ),
+}
+# The explanation blocks are rendered once; they never change between plans
+FOCUS_EXPLANATION_LINES = {
+    focus: (f"  {focus} Focus Explanation:",) + tuple(f"   - {line}" for line in lines)
+    for focus, lines in FOCUS_EXPLANATIONS.items()
+}
+WEAKNESS_NOTES = (
+    "Dedicate extra time to drilling and situational sparring",
+    "Focus on specific techniques or positions related to this weakness",
+)
+WEEKLY_FOOTER = (
+    "Wednesday: Active Recovery (Light drilling, Yoga, or Mobility work)",
+    "Sunday: Rest",
+)
+
+
+class Plan:
+    # Subclasses fill in _render() (text) and to_dict(); text is rendered once and kept,
+    # since memoized plans are shared between callers
+    _text = None
+
+    def to_text(self):
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def __str__(self):
+        return self.to_text()
+
+
+class Session:
+    # One training day: a label ("Monday (ME Lower)") and (exercise, prescription) pairs
+    def __init__(self, day, exercises):
+        self.day = day
+        self.exercises = exercises
+
+    def to_text(self):
+        return f"- {self.day}: " + ", ".join(f"{name} {prescription}" for name, prescription in self.exercises)
+
+    def to_dict(self):
+        return {'day': self.day,
+                'exercises': [{'exercise': name, 'prescription': prescription}
+                              for name, prescription in self.exercises]}
+
+
+class SCBody:
+    # The method-specific part of a strength & conditioning plan; notes may contain ''
+    # for a blank line
+    def __init__(self, intro, heading, sessions, notes):
+        self.intro = intro
+        self.heading = heading
+        self.sessions = sessions
+        self.notes = notes
+
+    def to_text(self):
+        lines = [self.intro, ""]
+        if self.heading:
+            lines.append(self.heading)
+        lines += [session.to_text() for session in self.sessions]
+        lines.append("")
+        lines += self.notes
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        return {'intro': self.intro, 'heading': self.heading,
+                'sessions': [session.to_dict() for session in self.sessions],
+                'notes': [note for note in self.notes if note]}
+
+
+class SCPlan(Plan):
+    def __init__(self, method, skill, level, body):
+        self.method = method
+        self.skill = skill
+        self.level = level
+        self.body = body  # None for an unknown method
+
+    @property
+    def title(self):
+        return f"{self.method} Plan for {self.skill.capitalize()} focused {self.level.capitalize()} BJJ practitioner:"
+
+    def _render(self):
+        body = self.body.to_text() if self.body is not None else ""
+        return f"{self.title}\n\n{body}" + "".join(f"\n{line}" for line in SC_FOOTER)
+
+    def to_dict(self):
+        return {'type': 'sc', 'method': self.method, 'skill': self.skill, 'level': self.level,
+                'title': self.title, 'body': self.body.to_dict() if self.body is not None else None,
+                'footer': list(SC_FOOTER)}
+
+
+class PeriodizedPlan(Plan):
+    def __init__(self, skill, level, weakness_focus):
+        self.skill = skill
+        self.level = level
+        self.weakness_focus = weakness_focus  # one entry per week, None without weaknesses
+
+    def lines(self):
+        lines = []
+        for week, weakness in enumerate(self.weakness_focus, 1):
+            lines.append(f"Week {week}:")
+            lines += PERIODIZED_WEEK
+            if weakness is not None:
+                lines.append(f"  Weakness Focus: {weakness}")
+        return lines
+
+    def _render(self):
+        return "\n".join(self.lines())
+
+    def to_dict(self):
+        return {'type': 'periodized', 'skill': self.skill, 'level': self.level,
+                'weeks': [{'week': week, 'schedule': [line.strip() for line in PERIODIZED_WEEK],
+                           'weakness_focus': weakness}
+                          for week, weakness in enumerate(self.weakness_focus, 1)]}
+
+
+class WeeklyDay:
+    def __init__(self, day, intensity, focus, techniques, conditioning, weakness=None):
+        self.day = day
+        self.intensity = intensity
+        self.focus = focus
+        self.techniques = techniques
+        self.conditioning = conditioning
+        self.weakness = weakness
+
+    def lines(self):
+        lines = [f"{self.day} ({self.intensity} - {self.focus} Focus):",
+                 f"  1. {self.techniques[0]}",
+                 f"  2. {self.techniques[1]}",
+                 f"  3. Conditioning: {self.conditioning}"]
+        lines += FOCUS_EXPLANATION_LINES.get(self.focus, ())
+        if self.weakness is not None:
+            lines.append(f"  4. Weakness Focus: {self.weakness}")
+            lines += [f"   - {note}" for note in WEAKNESS_NOTES]
+        return lines
+
+    def to_dict(self):
+        return {'day': self.day, 'intensity': self.intensity, 'focus': self.focus,
+                'techniques': list(self.techniques[:2]), 'conditioning': self.conditioning,
+                'explanation': list(FOCUS_EXPLANATIONS.get(self.focus, ())),
+                'weakness_focus': self.weakness}
+
+
+class WeeklyPlan(Plan):
+    def __init__(self, skill, level, days):
+        self.skill = skill
+        self.level = level
+        self.days = days
+
+    def lines(self):
+        lines = []
+        for day in self.days:
+            lines += day.lines()
+        lines += WEEKLY_FOOTER
+        return lines
+
+    def _render(self):
+        return "\n".join(self.lines())
+
+    def to_dict(self):
+        return {'type': 'weekly', 'skill': self.skill, 'level': self.level,
+                'days': [day.to_dict() for day in self.days], 'footer': list(WEEKLY_FOOTER)}
+
+
+def dynamic_effort_body(level, rng):
+    intensity, volume = DYNAMIC_EFFORT_LOADS.get(level, DYNAMIC_EFFORT_LOADS["advanced"])
+    sessions = [
+        Session(day, ((rng.choice(OLYMPIC_LIFTS), f"{volume} @ {intensity}"),
+                      (speed_lift, f"{sets} @ {intensity}"),
+                      (rng.choice(ACCESSORY_EXERCISES), "3x10")))
+        for day, speed_lift, sets in (("Monday", "Speed Squat", "8x2"), ("Wednesday", "Speed Bench", "8x3"),
+                                      ("Friday", "Speed Deadlift", "8x2"))
+    ]
+    return SCBody("12-Week Plan:", "Weeks 1-4 (Speed Strength Focus):", sessions,
+                  ["Weeks 5-8: Increase intensity by 5%, reduce rest times",
+                   "Weeks 9-12: Increase bar speed, maintain intensity"])
+
+
+def conjugate_body(level, rng):
+    me_intensity, de_intensity = CONJUGATE_LOADS.get(level, CONJUGATE_LOADS["advanced"])
+    sessions = [
+        Session("Monday (ME Lower)", ((rng.choice(MAX_EFFORT_EXERCISES), f"5x3 @ {me_intensity}"),
+                                      (rng.choice(OLYMPIC_LIFTS), "3x3"),
+                                      (rng.choice(ACCESSORY_EXERCISES), "3x10"))),
+    ]
+    sessions += [
+        Session(day, ((rng.choice(DYNAMIC_EFFORT_EXERCISES), f"{sets} @ {de_intensity}"),
+                      (rng.choice(OLYMPIC_LIFTS), "3x3"),
+                      (rng.choice(ACCESSORY_EXERCISES), "3x10")))
+        for day, sets in (("Wednesday (DE Upper)", "8x3"), ("Friday (DE Lower)", "8x2"))
+    ]
+    return SCBody("12-Week Plan:", "Week 1 Example:", sessions,
+                  ["Rotate exercises every 1-3 weeks for ME days",
+                   "Gradually increase bar speed and/or weight for DE days"])
+
+
+def _phase_session(day, load, accessory_sets, rng):
+    return Session(day, ((rng.choice(OLYMPIC_LIFTS), load), (rng.choice(COMPOUND_EXERCISES), load),
+                         (rng.choice(ACCESSORY_EXERCISES), accessory_sets)))
+
+
+def linear_body(level, rng):
+    hypertrophy, strength, power = PHASE_LOADS.get(level, PHASE_LOADS["advanced"])
+    sessions = [_phase_session(day, hypertrophy, "3x12", rng) for day in ("Monday", "Wednesday", "Friday")]
+    return SCBody("12-Week Plan:", "Weeks 1-4 (Hypertrophy):", sessions,
+                  [f"Weeks 5-8 (Strength): Same structure, but {strength}",
+                   f"Weeks 9-12 (Power): Same structure, but {power}"])
+
+
+def undulating_body(level, rng):
+    hypertrophy, strength, power = PHASE_LOADS.get(level, PHASE_LOADS["advanced"])
+    sessions = [_phase_session("Monday (Hypertrophy)", hypertrophy, "3x12", rng),
+                _phase_session("Wednesday (Strength)", strength, "3x10", rng),
+                _phase_session("Friday (Power)", power, "3x8", rng)]
+    return SCBody("Weekly Plan (repeat for 12 weeks):", None, sessions,
+                  ["Rotate exercises weekly while maintaining the undulating structure"])
+
+
+def block_body(level, rng):
+    hypertrophy, strength, power = PHASE_LOADS.get(level, PHASE_LOADS["advanced"])
+    sessions = [_phase_session(day, hypertrophy, "3x12", rng) for day in ("Monday", "Wednesday", "Friday")]
+    return SCBody("12-Week Plan:", "Weeks 1-4 (Hypertrophy Block):", sessions,
+                  [f"Weeks 5-8 (Strength Block): Same structure, but {strength}",
+                   f"Weeks 9-12 (Power Block): Same structure, but {power}",
+                   "",
+                   "Focus on increasing weight and/or volume each week within each block"])
+
+
+SC_BODIES = {
+    "Dynamic Effort Method": dynamic_effort_body,
+    "Conjugate Method (Westside Barbell)": conjugate_body,
+    "Linear Periodization": linear_body,
+    "Undulating Periodization": undulating_body,
+    "Block Periodization": block_body,
+}
+
+
+class PlanEngine:
+    # Builds plans for one technique catalog. Each build_* method takes either seed
+    # (memoized: the same inputs and seed return the same shared plan object) or rng (a
+    # random.Random, not memoized); with neither it draws from the global random module.
+    def __init__(self, catalog, memo_size=4096):
+        # catalog: a Catalog or a {category: [names]} dict, interned here; a Catalog never
+        # changes, so memoized weekly plans cannot go stale under us
+        self.catalog = catalog if isinstance(catalog, Catalog) else Catalog(catalog)
+        self._sc_memo = lru_cache(memo_size)(self._seeded(self._build_sc))
+        self._periodized_memo = lru_cache(memo_size)(self._seeded(self._build_periodized))
+        self._weekly_memo = lru_cache(memo_size)(self._seeded(self._build_weekly))
+
+    @staticmethod
+    def _seeded(build):
+        def run(*args):
+            return build(*args[:-1], rng=random.Random(args[-1]))
+        return run
+
+    def build_sc_plan(self, method, skill, level, seed=None, rng=None):
+        if seed is not None and rng is None:
+            return self._sc_memo(method, skill, level, seed)
+        return self._build_sc(method, skill, level, rng=rng or random)
+
+    def build_periodized_plan(self, skill, level, weaknesses, seed=None, rng=None):
+        weaknesses = tuple(weaknesses or ())
+        if seed is not None and rng is None:
+            return self._periodized_memo(skill, level, weaknesses, seed)
+        return self._build_periodized(skill, level, weaknesses, rng=rng or random)
+
+    def build_weekly_plan(self, skill, level, recommended_techniques, weaknesses, seed=None, rng=None):
+        # recommended_techniques: the user's scored techniques, the more the better (each
+        # day picks the best of its focus area); see candidates for the accepted forms
+        candidates = self.candidates(recommended_techniques)
+        weaknesses = tuple(weaknesses or ())
+        if seed is not None and rng is None:
+            return self._weekly_memo(skill, level, candidates, weaknesses, seed)
+        return self._build_weekly(skill, level, candidates, weaknesses, rng=rng or random)
+
+    def candidates(self, recommended):
+        # ((catalog id, score), ...) from technique names or catalog ids, optionally as
+        # (technique, score) pairs; bare entries are scored by rank, best first. Names
+        # outside the catalog are skipped.
+        candidates = []
+        for rank, item in enumerate(recommended):
+            technique, score = item if isinstance(item, tuple) else (item, -rank)
+            technique_id = self.catalog.index.get(technique) if isinstance(technique, str) else int(technique)
+            if technique_id is not None:
+                candidates.append((technique_id, float(score)))
+        return tuple(candidates)
+
+    def cache_info(self):
+        return {'sc': self._sc_memo.cache_info()._asdict(),
+                'periodized': self._periodized_memo.cache_info()._asdict(),
+                'weekly': self._weekly_memo.cache_info()._asdict()}
+
+    def _build_sc(self, method, skill, level, rng):
+        body = SC_BODIES.get(method)
+        return SCPlan(method, skill, level, body(level, rng) if body else None)
+
+    def _build_periodized(self, skill, level, weaknesses, rng):
+        weeks = PERIODIZED_WEEKS.get(level, PERIODIZED_WEEKS["advanced"])
+        return PeriodizedPlan(skill, level, [rng.choice(weaknesses) if weaknesses else None
+                                             for _ in range(weeks)])
+
+    def _build_weekly(self, skill, level, candidates, weaknesses, rng):
+        buckets = self._bucket(candidates, TECHNIQUES_PER_DAY)
+        days = []
+        for day, intensity, focus in WEEKLY_SCHEDULE:
+            focus_techniques = self._focus_techniques(focus, buckets, TECHNIQUES_PER_DAY, rng)
+            conditioning = rng.choice(CONDITIONING)
+            weakness = rng.choice(weaknesses) if weaknesses and rng.random() < 0.5 else None
+            days.append(WeeklyDay(day, intensity, focus, focus_techniques, conditioning, weakness))
+        return WeeklyPlan(skill, level, days)
+
+    def _bucket(self, candidates, n):
+        # One pass over the candidates into bounded min-heaps per category and gi/no-gi
+        # style, each keeping the n best (score, earlier first) of its bucket
+        heaps = {}
+        category, gi = self.catalog.category, self.catalog.gi
+        for order, (technique_id, score) in enumerate(candidates):
+            heap = heaps.setdefault(category[technique_id], {}).setdefault(gi[technique_id], [])
+            entry = (score, -order, technique_id)
+            if len(heap) < n:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        return heaps
+
+    def _focus_techniques(self, focus, buckets, n, rng):
+        # The focus area's best candidates, taking turns between its gi, no-gi and
+        # unlabeled buckets (best bucket first) so one style cannot fill the day while
+        # another has candidates. Short days are topped up with random techniques from
+        # the area, again preferring a style not picked yet.
+        ranked = sorted((sorted(heap, reverse=True) for heap in buckets.get(focus, {}).values()), reverse=True)
+        chosen = []
+        while len(chosen) < n and any(ranked):
+            for bucket in ranked:
+                if bucket and len(chosen) < n:
+                    chosen.append(bucket.pop(0)[2])
+        if len(chosen) < n:
+            rest = [i for i in self.catalog.members.get(focus, ()) if i not in chosen]
+            rng.shuffle(rest)
+            while len(chosen) < n and rest:
+                styles = {self.catalog.gi[i] for i in chosen}
+                pick = next((i for i in rest if self.catalog.gi[i] not in styles), rest[0])
+                rest.remove(pick)
+                chosen.append(pick)
+        return tuple(self.catalog.names[i] for i in chosen)
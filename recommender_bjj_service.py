@@ -0,0 +1,300 @@
+# Local JSON-over-HTTP service: one process holds the database handle and one warm model,
+# shared by every kiosk and app that talks to it. Built on asyncio streams only; scoring
+# runs on a thread pool (NumPy releases the GIL) and ratings go through a group-commit
+# queue, so concurrent /rate calls share transactions.
+#
+#   GET  /recommend?user_id=1&k=5
+#   GET  /similar?technique=Gi: Armbar&k=5
+#   GET  /plan?user_id=1&type=weekly|periodized|sc&method=...&weaknesses=a,b&seed=0
+#   POST /rate        {"user_id": 1, "technique": "Gi: Armbar", "rating": 5}
+#   GET  /health, GET /metrics (Prometheus text)
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from recommender_bjj_func import (Database, MatrixFactorizationRecommender, RatingWriteQueue, DEFAULT_CHECKPOINT_DIR,
+                                  S_C_METHODS, plan_engine)
+from recommender_bjj_metrics import metrics
+from recommender_bjj_model import COMPACT_DTYPES, TRAINERS
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RecommendBatcher:
+    # Collects recommendation lookups for up to `window` seconds (or max_batch lookups)
+    # and scores them with one recommend_many call per k. A lookup for a (user_id, k)
+    # that is already queued or being scored waits on the same future.
+    def __init__(self, recommender, executor, window=0.002, max_batch=256):
+        self.recommender = recommender
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = {}
+        self.inflight = {}
+        self._flush_handle = None
+
+    async def recommend(self, user_id, k):
+        key = (user_id, k)
+        future = self.pending.get(key) or self.inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.pending[key] = loop.create_future()
+            if len(self.pending) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+        # shield: one client hanging up must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self.pending = self.pending, {}
+        self.inflight.update(batch)
+        by_k = {}
+        for (user_id, k), future in batch.items():
+            by_k.setdefault(k, {})[user_id] = future
+        for k, futures in by_k.items():
+            asyncio.get_running_loop().create_task(self._score(k, futures))
+
+    async def _score(self, k, futures):
+        try:
+            recommendations = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.recommender.recommend_many, list(futures), k)
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for user_id, future in futures.items():
+                if not future.done():
+                    future.set_result(recommendations[user_id])
+        finally:
+            for user_id in futures:
+                self.inflight.pop((user_id, k), None)
+
+
+def _param(query, name, cast=str, default=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'missing parameter: {name}')
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'invalid parameter: {name}')
+
+
+class RecommenderService:
+    def __init__(self, db, recommender, workers=None, window=0.002, max_batch=256, write_delay=0.005):
+        self.db = db
+        self.recommender = recommender
+        self.cpu = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix='bjj-cpu')
+        # Writes go through one thread, matching the Database's single writer connection;
+        # each batch is folded into the model once
+        self.ratings = RatingWriteQueue(db, max_delay=write_delay, on_batch=[recommender.fold_in_many])
+        self.batcher = RecommendBatcher(recommender, self.cpu, window, max_batch)
+        self.routes = {
+            ('GET', '/recommend'): self.recommend,
+            ('GET', '/similar'): self.similar,
+            ('GET', '/plan'): self.plan,
+            ('POST', '/rate'): self.rate,
+            ('GET', '/health'): self.health,
+        }
+
+    async def _run(self, executor, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def recommend(self, query, body):
+        user_id = _param(query, 'user_id', int)
+        k = _param(query, 'k', int, 5)
+        return {'user_id': user_id, 'recommendations': await self.batcher.recommend(user_id, k),
+                'model_version': self.recommender.model_version}
+
+    async def similar(self, query, body):
+        technique = self._technique(_param(query, 'technique'))
+        k = _param(query, 'k', int, 5)
+        # A single row lookup in the neighbor index; cheap enough for the event loop
+        return {'technique': technique, 'similar': self.recommender.similar_techniques(technique, k)}
+
+    async def plan(self, query, body):
+        user_id = _param(query, 'user_id', int)
+        plan_type = _param(query, 'type', str, 'weekly')
+        seed = _param(query, 'seed', int, -1)
+        seed = None if seed < 0 else seed
+        weaknesses = [w.strip() for w in _param(query, 'weaknesses', str, '').split(',') if w.strip()]
+        profile = await self._run(self.cpu, self.db.get_user_info, user_id)
+        if profile is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'unknown user: {user_id}')
+        skill, level = profile[0] or '', profile[1] or 'beginner'
+        if plan_type == 'weekly':
+            # Every unrated technique in rank order; each day takes the best of its area
+            recommended = await self.batcher.recommend(user_id, _param(query, 'k', int,
+                                                                       len(self.recommender.catalog)))
+            plan = plan_engine.build_weekly_plan(skill, level, recommended, weaknesses, seed=seed)
+        elif plan_type == 'periodized':
+            plan = plan_engine.build_periodized_plan(skill, level, weaknesses, seed=seed)
+        elif plan_type == 'sc':
+            method = _param(query, 'method', str, 'Linear Periodization')
+            if method not in S_C_METHODS:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f'unknown method: {method}')
+            plan = plan_engine.build_sc_plan(method, skill, level, seed=seed)
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'unknown plan type: {plan_type}')
+        return dict(plan.to_dict(), user_id=user_id, text=plan.to_text())
+
+    async def rate(self, query, body):
+        try:
+            payload = json.loads(body or b'{}')
+            user_id, technique, rating = int(payload['user_id']), payload['technique'], int(payload['rating'])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"user_id", "technique", "rating"}')
+        if not 1 <= rating <= 5:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'rating must be between 1 and 5')
+        technique = self._technique(str(technique))
+        if not await asyncio.wrap_future(self.ratings.submit(user_id, technique, rating)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'unknown technique: {technique}')
+        return {'ok': True, 'technique': technique}
+
+    def _technique(self, query):
+        # Exact names, prefixes and near-misses all resolve if they name one technique
+        technique = self.recommender.catalog.resolve_one(query)
+        if technique is None:
+            candidates = [self.recommender.catalog.names[i] for i, _ in self.recommender.catalog.resolve(query)]
+            message = f'ambiguous technique: {query}' if candidates else f'unknown technique: {query}'
+            raise HTTPError(HTTPStatus.NOT_FOUND, message + (f" (did you mean {', '.join(candidates)}?)"
+                                                             if candidates else ''))
+        return technique
+
+    async def health(self, query, body):
+        return {'model_version': self.recommender.model_version,
+                'last_trained': self.recommender.last_trained,
+                'trained': self.recommender.model is not None,
+                'cache': self.recommender.cache.stats()}
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if method == 'GET' and url.path == '/metrics':
+            return HTTPStatus.OK, metrics.to_prometheus(), 'text/plain; version=0.0.4'
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'{method} not allowed on {url.path}')
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'no such endpoint: {url.path}')
+        result = await handler(parse_qs(url.query), body)
+        return HTTPStatus.OK, json.dumps(result), 'application/json'
+
+    async def handle_connection(self, reader, writer):
+        # Minimal HTTP/1.1: one request at a time per connection, keep-alive by default
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close' and
+                              (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+                try:
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY:
+                        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'request body too large')
+                    body = await reader.readexactly(length) if length else b''
+                    status, text, content_type = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, text, content_type = e.status, json.dumps({'error': e.message}), 'application/json'
+                except ValueError:
+                    status, text, content_type = (HTTPStatus.BAD_REQUEST, json.dumps({'error': 'bad request'}),
+                                                  'application/json')
+                except Exception:
+                    logger.exception('Error handling %s %s', method, target)
+                    status, text, content_type = (HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                  json.dumps({'error': 'internal error'}), 'application/json')
+                data = text.encode()
+                writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                             f'Content-Type: {content_type}\r\n'
+                             f'Content-Length: {len(data)}\r\n'
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info('Serving on %s', ', '.join(str(sock.getsockname()) for sock in server.sockets))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        # Scoring jobs still queued were cancelled with their tasks when asyncio.run
+        # shut the loop down
+        self.cpu.shutdown(wait=False)
+        self.ratings.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve recommendations and plans over local HTTP.')
+    parser.add_argument('--db', default='bjj_recommender.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--checkpoint-dir', default=DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument('--backend', choices=list(TRAINERS), default='sgd', help='training backend')
+    parser.add_argument('--compact', choices=COMPACT_DTYPES, help='serve from float32 or int8 user factors')
+    parser.add_argument('--workers', type=int, default=None, help='scoring threads (default: CPU count)')
+    parser.add_argument('--batch-window-ms', type=float, default=2.0,
+                        help='how long /recommend lookups wait to be scored together')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--write-delay-ms', type=float, default=5.0,
+                        help='how long a rating waits for others to share its commit')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    db = Database(args.db, performance=True)
+    # Loads the checkpoint if it is current; otherwise trains in the background while
+    # cold-start recommendations are served
+    recommender = MatrixFactorizationRecommender(db, background=True, checkpoint_dir=args.checkpoint_dir,
+                                                 backend=args.backend, compact=args.compact)
+    service = RecommenderService(db, recommender, args.workers, args.batch_window_ms / 1000, args.max_batch,
+                                 args.write_delay_ms / 1000)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        recommender.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
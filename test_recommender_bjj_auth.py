@@ -0,0 +1,18 @@
+import threading
+
+from recommender_bjj_auth import AuthService
+from recommender_bjj_func import Database
+
+
+def test_close_cancels_queued_logins():
+    db = Database(':memory:')
+    auth = AuthService(db, method='pbkdf2:sha256:1000', workers=1)
+    started, release = threading.Event(), threading.Event()
+    blocker = auth._submit(lambda: (started.set(), release.wait(10)), None)
+    assert started.wait(10)
+    queued = [auth.login('nobody', 'secret') for _ in range(5)]
+    auth.close()
+    release.set()
+    assert all(future.cancelled() for future in queued)
+    assert blocker.result(10)[1]
+    db.close()
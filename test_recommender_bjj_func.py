@@ -0,0 +1,70 @@
+import threading
+
+from recommender_bjj_catalog import Catalog
+from recommender_bjj_func import Database, MatrixFactorizationRecommender, RecommendationRefresher
+
+CATALOG = {
+    'Submissions': ['Gi: Armbar', 'No-Gi: Kimura', 'Gi: Triangle Choke', 'No-Gi: Heel Hook'],
+    'Sweeps': ['Gi: Scissor Sweep', 'No-Gi: Butterfly Sweep', 'Gi: Flower Sweep'],
+    'Guard Passes': ['Gi: Knee Slice', 'No-Gi: Leg Drag', 'Gi: Toreando Pass'],
+}
+NAMES = [name for names in CATALOG.values() for name in names]
+
+
+def add_members(db, n_users=30):
+    with db.transaction():
+        db.conn.executemany('INSERT INTO users (id, username, password, skill, level) VALUES (?, ?, ?, ?, ?)',
+                            [(user_id, f'member{user_id}', 'x', 'guard', 'beginner')
+                             for user_id in range(1, n_users + 1)])
+
+
+def rate_all(db, n_users=30):
+    rows = [(user_id, name, 1 + (user_id + i) % 5) for user_id in range(1, n_users + 1)
+            for i, name in enumerate(NAMES) if (user_id + i) % 3]
+    inserted, rejected = db.add_ratings_bulk(rows)
+    assert not rejected
+    return inserted
+
+
+def test_background_training_sees_an_in_memory_database():
+    db = Database(':memory:')
+    db.sync_catalog(Catalog(CATALOG))
+    add_members(db)
+    inserted = rate_all(db)
+    trained = threading.Event()
+    recommender = MatrixFactorizationRecommender(db, catalog=CATALOG, background=True, debounce=0)
+    recommender.add_listener(lambda version, _: recommender.model is not None and trained.set())
+    try:
+        assert recommender.model is not None or trained.wait(30)
+        assert recommender.model.n_ratings == inserted
+    finally:
+        recommender.close()
+        db.close()
+
+
+def test_databases_with_different_technique_ids_share_a_catalog():
+    catalog = Catalog(CATALOG)
+    databases = []
+    for names in (NAMES[::-1], NAMES):
+        # The same techniques, numbered in opposite orders
+        db = Database(':memory:')
+        with db.transaction():
+            db.conn.executemany('INSERT INTO techniques (name, category) VALUES (?, ?)',
+                                [(name, catalog.category[catalog.index[name]]) for name in names])
+        add_members(db)
+        rate_all(db)
+        databases.append(db)
+    recommenders = [MatrixFactorizationRecommender(db, catalog=catalog) for db in databases]
+    try:
+        for db, recommender in zip(databases, recommenders):
+            for user_id in range(1, 31):
+                rated = {name for name, _ in db.get_user_ratings(user_id)}
+                recommended = recommender.recommend_techniques(user_id, k=3)
+                assert recommended and not rated & set(recommended)
+            RecommendationRefresher(recommender, depth=3).refresh()
+            for user_id in range(1, 31):
+                assert db.get_recommendations(user_id, 3) == recommender.recommend_techniques(user_id, k=3)
+    finally:
+        for recommender, db in zip(recommenders, databases):
+            recommender.close()
+            db.close()
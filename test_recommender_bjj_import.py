@@ -0,0 +1,16 @@
+from recommender_bjj_func import Database
+from recommender_bjj_import import main
+
+
+def test_import_into_a_fresh_database(tmp_path, capsys):
+    path = tmp_path / 'ratings.csv'
+    path.write_text('user_id,technique,rating\n1,Gi: Armbar,5\n1,No-Gi: Kimura,4\n2,Gi: Armbar,3\n'
+                    '2,Not A Technique,2\n')
+    db_path = str(tmp_path / 'fresh.db')
+    main([str(path), '--db', db_path])
+    assert 'Imported 3 ratings, rejected 1' in capsys.readouterr().err
+    db = Database(db_path)
+    try:
+        assert db.count_ratings() == 3
+    finally:
+        db.close()
@@ -0,0 +1,55 @@
+import os
+import threading
+
+import numpy as np
+
+from recommender_bjj_model import RATING_SCALE, FactorModel, load_checkpoint, save_checkpoint
+
+
+def random_model(n_users=50, n_items=1500, n_factors=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return FactorModel(3.2, rng.normal(0, 0.1, (n_users, n_factors)), rng.normal(0, 0.1, n_users),
+                       rng.normal(0, 0.1, (n_items, n_factors)), rng.normal(0, 0.1, n_items),
+                       list(range(n_users)), [f'item {i}' for i in range(n_items)], seed=seed)
+
+
+def test_fold_in_stays_stable_for_users_with_many_ratings():
+    model = random_model()
+    rng = np.random.default_rng(1)
+    ratings = [(f'item {i}', int(rng.integers(1, 6))) for i in range(1200)]
+    model.fold_in(10 ** 6, ratings, *ratings[-1])
+    items = [name for name, _ in ratings]
+    predictions = model.predict_many([10 ** 6] * len(items), items)
+    assert np.isfinite(predictions).all()
+    assert ((predictions >= RATING_SCALE[0]) & (predictions <= RATING_SCALE[1])).all()
+    assert np.isfinite(model.pu).all() and abs(model.bu[-1]) < RATING_SCALE[1]
+    # The refit user still tracks their own ratings
+    assert abs(predictions.mean() - np.mean([rating for _, rating in ratings])) < 0.5
+
+
+def test_fold_in_moves_a_new_user_towards_their_ratings():
+    model = random_model()
+    model.fold_in(10 ** 6, [('item 0', 5), ('item 1', 5), ('item 2', 5)], 'item 2', 5)
+    assert model.predict(10 ** 6, 'item 0') > model.predict(99, 'item 0')
+
+
+def test_concurrent_checkpoints_leave_a_loadable_latest(tmp_path):
+    models = [random_model(seed=seed) for seed in range(8)]
+    for model in models:
+        model.align_items(model.item_names)
+    barrier = threading.Barrier(len(models))
+
+    def save(model):
+        barrier.wait()
+        for _ in range(5):
+            save_checkpoint(model, str(tmp_path))
+
+    threads = [threading.Thread(target=save, args=(model,)) for model in models]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    loaded = load_checkpoint(str(tmp_path))
+    assert loaded is not None
+    assert any(np.array_equal(loaded.pu, model.pu) for model in models)
+    assert not [entry for entry in os.listdir(tmp_path) if entry.startswith('.')]